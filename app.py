@@ -2,14 +2,23 @@ import streamlit as st
 import json
 import sys
 import os
+import queue
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from config import client, MODEL, MAX_TOKENS, SEVERITY
-from prompts import GA4_AUDIT_PROMPT, GTM_AUDIT_PROMPT, DATALAYER_AUDIT_PROMPT
-from synthesizer import synthesize_results
+from config import SEVERITY, AUDIT_WORKERS, RETRY_BUDGET, SYNTHESIS_MODE, client
+from cache import make_key, response_cache
+from history import history_store
+from ratelimit import retry_budget, submit_with_context
+from telemetry import collect, registry
+from runner import SECTION_AUDITORS, run_section
+from dedup import dedupe_findings, visible_findings, also_reported_in
+from auditors.datalayer_stream import MAX_RAW_CHARS
+from synthesizer import llm_synthesis, local_synthesis
 
 # --- Page Config ---
 st.set_page_config(
@@ -96,28 +105,6 @@ st.markdown("""
 
 
 # --- Helper Functions ---
-def run_audit(prompt, data_dict):
-    formatted_prompt = prompt.format(**data_dict)
-    response = client.messages.create(
-        model=MODEL, max_tokens=MAX_TOKENS,
-        messages=[{"role": "user", "content": formatted_prompt}]
-    )
-    response_text = response.content[0].text
-    cleaned = response_text.strip()
-    if cleaned.startswith("```"):
-        lines = cleaned.split("\n")
-        cleaned = "\n".join(lines[1:-1])
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        return {
-            "findings": [{"issue": "Audit parsing failed", "severity": "info",
-                         "category": "error", "details": response_text[:500],
-                         "fix": "Try running again", "business_impact": "N/A"}],
-            "score": 0, "summary": "Could not parse audit results"
-        }
-
-
 def get_score_color(score):
     if score >= 70: return "#22c55e"
     elif score >= 40: return "#f59e0b"
@@ -132,61 +119,106 @@ def get_health_color(health):
     return colors.get(health, "#6b7280")
 
 
+def render_finding(i, finding):
+    sev = finding.get("severity", "info")
+    badge_class = f"badge-{sev}"
+    st.markdown(f"""
+    <div class="finding-card">
+        <div class="finding-title">
+            #{i} {finding.get('issue', 'N/A')}
+            <span class="badge {badge_class}">{sev.upper()}</span>
+        </div>
+        <div class="finding-detail"><strong>Category:</strong> {finding.get('category', 'N/A')}</div>
+        <div class="finding-detail"><strong>Details:</strong> {finding.get('details', 'N/A')}</div>
+        <div class="finding-fix"><strong>How to Fix:</strong> {finding.get('fix', 'N/A')}</div>
+        <div class="finding-detail" style="margin-top: 0.3rem;"><strong>Business Impact:</strong> {finding.get('business_impact', 'N/A')}</div>
+        {f'<div class="finding-detail"><strong>Also reported in:</strong> {also_reported_in(finding)}</div>' if finding.get('also_reported_in') else ''}
+    </div>
+    """, unsafe_allow_html=True)
+
+
 def render_findings(findings):
     severity_order = {"critical": 0, "high": 1, "medium": 2, "low": 3, "info": 4}
     findings.sort(key=lambda x: severity_order.get(x.get("severity", "info"), 5))
     for i, finding in enumerate(findings, 1):
-        sev = finding.get("severity", "info")
-        badge_class = f"badge-{sev}"
-        st.markdown(f"""
-        <div class="finding-card">
-            <div class="finding-title">
-                #{i} {finding.get('issue', 'N/A')}
-                <span class="badge {badge_class}">{sev.upper()}</span>
-            </div>
-            <div class="finding-detail"><strong>Category:</strong> {finding.get('category', 'N/A')}</div>
-            <div class="finding-detail"><strong>Details:</strong> {finding.get('details', 'N/A')}</div>
-            <div class="finding-fix"><strong>How to Fix:</strong> {finding.get('fix', 'N/A')}</div>
-            <div class="finding-detail" style="margin-top: 0.3rem;"><strong>Business Impact:</strong> {finding.get('business_impact', 'N/A')}</div>
-        </div>
-        """, unsafe_allow_html=True)
+        render_finding(i, finding)
 
 
-def save_audit_history(results, synthesis):
-    """Save audit results as JSON for historical comparison"""
-    history_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audit_history")
-    os.makedirs(history_dir, exist_ok=True)
-    
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    filename = f"audit-{timestamp}.json"
-    filepath = os.path.join(history_dir, filename)
-    
-    history_entry = {
-        "timestamp": datetime.now().isoformat(),
-        "setup": results["setup"],
-        "scores": {
-            "overall": round((results["ga4"].get("score", 0) + results["gtm"].get("score", 0) + results["datalayer"].get("score", 0)) / 3),
-            "ga4": results["ga4"].get("score", 0),
-            "gtm": results["gtm"].get("score", 0),
-            "datalayer": results["datalayer"].get("score", 0)
-        },
-        "total_findings": (
-            len(results["ga4"].get("findings", [])) +
-            len(results["gtm"].get("findings", [])) +
-            len(results["datalayer"].get("findings", []))
-        ),
-        "synthesis": synthesis,
-        "full_results": {
-            "ga4": results["ga4"],
-            "gtm": results["gtm"],
-            "datalayer": results["datalayer"]
-        }
+SECTION_TITLES = {
+    "ga4": "GA4 Event Coverage",
+    "gtm": "GTM Container Health",
+    "datalayer": "DataLayer Quality"
+}
+
+
+def render_section(section, results):
+    st.subheader(f"{SECTION_TITLES[section]} — {results.get('score', 0)}/100")
+    st.caption(results.get("summary", ""))
+    st.progress(results.get("score", 0) / 100)
+    render_findings(visible_findings(results))
+
+
+# Download payloads are shared by every session and rerun; this many result sets are kept
+DOWNLOAD_CACHE_ENTRIES = 32
+
+
+@st.cache_resource(max_entries=DOWNLOAD_CACHE_ENTRIES, show_spinner=False)
+def build_html_download(results_key, _results):
+    """HTML report bytes for one result set, rendered in memory once per results_key"""
+    from export_html import render_report
+    html = render_report(_results["ga4"], _results["gtm"], _results["datalayer"], _results["setup"])
+    return html.encode("utf-8")
+
+
+@st.cache_resource(max_entries=DOWNLOAD_CACHE_ENTRIES, show_spinner=False)
+def build_json_download(results_key, _results, _synthesis):
+    """JSON export bytes for one result set, serialised once per results_key"""
+    scores = {
+        "GA4 Events": _results["ga4"].get("score", 0),
+        "GTM Health": _results["gtm"].get("score", 0),
+        "DataLayer": _results["datalayer"].get("score", 0)
     }
-    
-    with open(filepath, 'w') as f:
-        json.dump(history_entry, f, indent=2)
-    
-    return filepath
+    json_export = {
+        "timestamp": _results.get("completed_at"),
+        "setup": _results["setup"],
+        "scores": {"overall": round(sum(scores.values()) / len(scores)), **scores},
+        "synthesis": _synthesis,
+        "ga4_results": _results["ga4"],
+        "gtm_results": _results["gtm"],
+        "datalayer_results": _results["datalayer"]
+    }
+    return json.dumps(json_export, indent=2).encode("utf-8")
+
+
+@st.cache_resource(show_spinner=False)
+def synthesis_pool():
+    """Background workers for Claude syntheses, shared by every session"""
+    return ThreadPoolExecutor(max_workers=max(1, AUDIT_WORKERS))
+
+
+def finish_audit(synthesis):
+    """Make synthesis the result set's final plan and record the run in the audit history"""
+    st.session_state.synthesis = synthesis
+    # Identifies this result set for the cached download payloads
+    st.session_state.results_key = make_key(st.session_state.results, synthesis)
+    try:
+        history_store.record_run(st.session_state.results, synthesis)
+    except (sqlite3.Error, OSError) as e:
+        st.warning(f"Audit history was not saved: {e}")
+
+
+def download_slot(name, label, build, **button_args):
+    """A download button whose payload is built only after the user asks for it.
+
+    The first click marks this result set as requested for `name`; from then
+    on the cached payload is served on every rerun.
+    """
+    key = st.session_state.results_key
+    if st.session_state.get(f"download_{name}") == key:
+        st.download_button(label=label, data=build(), use_container_width=True, **button_args)
+    elif st.button(label, key=f"prepare_{name}", use_container_width=True):
+        st.session_state[f"download_{name}"] = key
+        st.rerun()
 
 
 # --- App Layout ---
@@ -233,8 +265,12 @@ with st.sidebar:
                             placeholder="Paste from GTM > Tags overview...")
     datalayer_sample = st.text_area("DataLayer Sample", height=120,
                                     placeholder="Paste from console:\nJSON.stringify(dataLayer, null, 2)")
+    datalayer_file = st.file_uploader("...or upload a large dataLayer dump", type=["json", "txt"],
+                                      help="Streamed push by push, never loaded into the page")
     
     st.divider()
+    force_refresh = st.checkbox("Force fresh audit", value=False,
+                                help="Skip cached responses and call Claude again")
     run_audit_btn = st.button("🚀 Run Audit", type="primary", use_container_width=True)
 
 # --- Main Content ---
@@ -250,47 +286,87 @@ if run_audit_btn:
             "ga4_events": ga4_events, "gtm_tags": gtm_tags,
             "datalayer_sample": datalayer_sample
         }
+        # Uploaded dumps are streamed by the auditor; only a short label is kept in session state
+        audit_setup = dict(setup)
+        if datalayer_file is not None:
+            datalayer_file.seek(0)
+            audit_setup["datalayer_sample"] = datalayer_file
+            setup["datalayer_sample"] = f"[uploaded file: {datalayer_file.name}, {datalayer_file.size:,} bytes]"
+        elif len(datalayer_sample) > MAX_RAW_CHARS:
+            setup["datalayer_sample"] = f"[pasted dataLayer dump, {len(datalayer_sample):,} characters]"
         
-        progress = st.progress(0, text="Starting audit...")
+        progress = st.progress(0, text="🚀 Auditing GA4, GTM and dataLayer in parallel...")
         
-        # GA4 Audit
-        progress.progress(10, text="🔵 Auditing GA4 event coverage...")
-        ga4_data = ga4_events if ga4_events else f"No specific event list provided. Industry: {industry}, Type: {website_type}, Platform: {platform}, Goals: {', '.join(goals)}. Recommend what events SHOULD exist."
-        ga4_results = run_audit(GA4_AUDIT_PROMPT, {
-            "industry": industry, "website_type": website_type,
-            "goals": ", ".join(goals), "ga4_data": ga4_data
-        })
+        # Live view: each section tab fills in as soon as its audit lands
+        live_view = st.empty()
+        with live_view.container():
+            live_tabs = st.tabs(["🔵 GA4 Events", "🟠 GTM Health", "🟣 DataLayer"])
+            placeholders = {}
+            for section, tab in zip(SECTION_AUDITORS, live_tabs):
+                placeholders[section] = tab.empty()
+                placeholders[section].info(f"⏳ Auditing {SECTION_TITLES[section]}...")
         
-        # GTM Audit
-        progress.progress(35, text="🟠 Auditing GTM container health...")
-        gtm_data = gtm_tags if gtm_tags else f"No specific GTM data provided. Setup: {website_type} in {industry} using {platform}. Provide general GTM health checklist."
-        gtm_results = run_audit(GTM_AUDIT_PROMPT, {"gtm_data": gtm_data})
+        # Workers can't touch Streamlit, so they post events back to this thread
+        events = queue.Queue()
+        streamed = {section: [] for section in SECTION_AUDITORS}
+        stream_boxes = {}
+        section_results = {}
+        # One retry budget covers every API request of this audit run; metrics are collected per run
+        with retry_budget(RETRY_BUDGET), collect() as run_metrics:
+            with ThreadPoolExecutor(max_workers=max(1, AUDIT_WORKERS)) as pool:
+                for section in SECTION_AUDITORS:
+                    on_finding = lambda finding, section=section: events.put(("finding", section, finding))
+                    future = submit_with_context(pool, run_section, section, audit_setup, force_refresh, on_finding)
+                    future.add_done_callback(lambda f, section=section: events.put(("done", section, f)))
+            
+                while len(section_results) < len(SECTION_AUDITORS):
+                    kind, section, payload = events.get()
+                    if kind == "finding":
+                        if not streamed[section]:
+                            stream_boxes[section] = placeholders[section].container()
+                            stream_boxes[section].caption(f"⏳ {SECTION_TITLES[section]} — findings streaming in...")
+                        streamed[section].append(payload)
+                        with stream_boxes[section]:
+                            render_finding(len(streamed[section]), payload)
+                        continue
+                
+                    section_results[section] = payload.result()
+                    with placeholders[section].container():
+                        render_section(section, section_results[section])
+                    done = len(section_results)
+                    progress.progress(done * 25, text=f"✅ {SECTION_TITLES[section]} complete ({done}/3)")
         
-        # DataLayer Audit
-        progress.progress(60, text="🟣 Auditing dataLayer quality...")
-        dl_data = datalayer_sample if datalayer_sample else f"No dataLayer sample provided. Setup: {website_type} in {industry} using {platform}. Recommend dataLayer structure."
-        datalayer_results = run_audit(DATALAYER_AUDIT_PROMPT, {
-            "website_type": website_type, "datalayer_data": dl_data
-        })
+            # Merge findings several sections report before they are shown and synthesised
+            dedupe_findings(section_results)
+            ga4_results = section_results["ga4"]
+            gtm_results = section_results["gtm"]
+            datalayer_results = section_results["datalayer"]
         
-        # Synthesis
-        progress.progress(85, text="🧠 Generating strategic recommendations...")
-        synthesis = synthesize_results(ga4_results, gtm_results, datalayer_results, setup)
+            # The local plan renders at once; Claude's synthesis replaces it when it lands
+            synthesis = local_synthesis(ga4_results, gtm_results, datalayer_results, setup)
+            synthesis_future = None
+            if SYNTHESIS_MODE != "local":
+                synthesis_future = submit_with_context(synthesis_pool(), llm_synthesis, ga4_results, gtm_results,
+                                                       datalayer_results, setup, force_refresh)
         
+        live_view.empty()
         progress.progress(100, text="✅ Audit complete!")
         
         # Save to session state
         st.session_state.results = {
             "ga4": ga4_results, "gtm": gtm_results,
-            "datalayer": datalayer_results, "setup": setup
+            "datalayer": datalayer_results, "setup": setup,
+            "completed_at": datetime.now().isoformat()
         }
-        st.session_state.synthesis = synthesis
-        
-        # Save history
-        try:
-            save_audit_history(st.session_state.results, synthesis)
-        except Exception:
-            pass  # Don't break the app if history save fails
+        st.session_state.diagnostics = run_metrics.summary()
+        if synthesis_future is None:
+            finish_audit(synthesis)
+        else:
+            st.session_state.synthesis = synthesis
+            st.session_state.results_key = make_key(st.session_state.results, synthesis)
+            st.session_state.synthesis_future = synthesis_future
+            # The synthesis keeps recording into this run's metrics; the diagnostics are refreshed when it lands
+            st.session_state.run_metrics = run_metrics
 
 # --- Display Results ---
 if "results" in st.session_state:
@@ -299,6 +375,8 @@ if "results" in st.session_state:
     gtm_results = results["gtm"]
     datalayer_results = results["datalayer"]
     synthesis = st.session_state.get("synthesis", {})
+    if "results_key" not in st.session_state:
+        st.session_state.results_key = make_key(results, synthesis)
     
     scores = {
         "GA4 Events": ga4_results.get("score", 0),
@@ -331,6 +409,10 @@ if "results" in st.session_state:
     ])
     
     with tab1:
+        if st.session_state.get("synthesis_future") is not None:
+            st.caption("⚡ Instant plan built from the findings — Claude's strategy replaces it in a moment...")
+        elif synthesis.get("source") == "local":
+            st.caption("Plan built locally from the audit findings.")
         if synthesis:
             # Health badge
             health = synthesis.get("overall_health", "needs_attention")
@@ -398,30 +480,21 @@ if "results" in st.session_state:
             st.info("Strategy synthesis not available. Re-run the audit to generate.")
     
     with tab2:
-        st.subheader(f"GA4 Event Coverage — {ga4_results.get('score', 0)}/100")
-        st.caption(ga4_results.get("summary", ""))
-        st.progress(ga4_results.get("score", 0) / 100)
-        render_findings(ga4_results.get("findings", []))
+        render_section("ga4", ga4_results)
     
     with tab3:
-        st.subheader(f"GTM Container Health — {gtm_results.get('score', 0)}/100")
-        st.caption(gtm_results.get("summary", ""))
-        st.progress(gtm_results.get("score", 0) / 100)
-        render_findings(gtm_results.get("findings", []))
+        render_section("gtm", gtm_results)
     
     with tab4:
-        st.subheader(f"DataLayer Quality — {datalayer_results.get('score', 0)}/100")
-        st.caption(datalayer_results.get("summary", ""))
-        st.progress(datalayer_results.get("score", 0) / 100)
-        render_findings(datalayer_results.get("findings", []))
+        render_section("datalayer", datalayer_results)
     
     with tab5:
         st.subheader("Priority Action Items")
         st.caption("Critical and high severity issues requiring immediate attention")
         all_findings = (
-            ga4_results.get("findings", []) +
-            gtm_results.get("findings", []) +
-            datalayer_results.get("findings", [])
+            visible_findings(ga4_results) +
+            visible_findings(gtm_results) +
+            visible_findings(datalayer_results)
         )
         critical_high = [f for f in all_findings if f.get("severity") in ("critical", "high")]
         critical_high.sort(key=lambda x: 0 if x.get("severity") == "critical" else 1)
@@ -444,36 +517,53 @@ if "results" in st.session_state:
     col_dl1, col_dl2 = st.columns(2)
     
     with col_dl1:
-        from export_html import export_report
-        filepath = export_report(ga4_results, gtm_results, datalayer_results, results["setup"])
-        with open(filepath, 'r') as f:
-            html_content = f.read()
-        st.download_button(
-            label="📄 Download HTML Report",
-            data=html_content,
-            file_name="analytics-audit-report.html",
-            mime="text/html",
-            use_container_width=True
-        )
-        os.remove(filepath)
+        download_slot("html", "📄 Download HTML Report",
+                      lambda: build_html_download(st.session_state.results_key, results),
+                      file_name="analytics-audit-report.html", mime="text/html")
     
     with col_dl2:
-        json_export = {
-            "timestamp": datetime.now().isoformat(),
-            "setup": results["setup"],
-            "scores": {"overall": overall, **scores},
-            "synthesis": synthesis,
-            "ga4_results": ga4_results,
-            "gtm_results": gtm_results,
-            "datalayer_results": datalayer_results
-        }
-        st.download_button(
-            label="📊 Download JSON Data",
-            data=json.dumps(json_export, indent=2),
-            file_name="analytics-audit-data.json",
-            mime="application/json",
-            use_container_width=True
-        )
+        download_slot("json", "📊 Download JSON Data",
+                      lambda: build_json_download(st.session_state.results_key, results, synthesis),
+                      file_name="analytics-audit-data.json", mime="application/json")
+    
+    # Diagnostics
+    diagnostics = st.session_state.get("diagnostics")
+    if diagnostics:
+        with st.expander("🩺 Diagnostics"):
+            counters = diagnostics["counters"]
+            col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+            with col_m1: st.metric("Run time", f"{diagnostics['wall_seconds']:.1f}s")
+            with col_m2: st.metric("API calls", int(counters.get("api_responses", 0)))
+            with col_m3: st.metric("Tokens in / out", f"{int(counters.get('input_tokens', 0)):,} / "
+                                                      f"{int(counters.get('output_tokens', 0)):,}")
+            with col_m4: st.metric("Prompt-cache reads", f"{int(counters.get('cache_read_input_tokens', 0)):,}")
+            
+            st.markdown("**Stages** (per-section time includes its API calls)")
+            st.table([
+                {"stage": stage, "count": s["count"], "total (s)": s["total_seconds"], "max (s)": s["max_seconds"]}
+                for stage, s in diagnostics["stages"].items()
+            ])
+            st.markdown("**Counters**")
+            st.json(counters)
+            st.markdown("**API client** (process totals: requests, retries, time spent throttled)")
+            st.json(client.get_stats())
+            st.markdown("**Response cache** (process totals: hits per tier, misses, entries held)")
+            st.json(response_cache.get_stats())
+            st.markdown("**Prometheus** (process totals)")
+            st.code(registry.to_prometheus(), language="text")
+    
+    # Everything above is already on screen; swap in Claude's synthesis once it arrives
+    synthesis_future = st.session_state.get("synthesis_future")
+    if synthesis_future is not None:
+        with st.spinner("🧠 Refining the strategy with Claude..."):
+            try:
+                upgraded = synthesis_future.result()
+            except Exception:
+                upgraded = None
+        del st.session_state.synthesis_future
+        st.session_state.diagnostics = st.session_state.pop("run_metrics").summary()
+        finish_audit(upgraded or synthesis)
+        st.rerun()
 
 else:
     st.markdown("""
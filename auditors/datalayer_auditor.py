@@ -1,43 +1,64 @@
 # DataLayer Quality Auditor
-import json
-from config import client, MODEL, MAX_TOKENS
-from prompts import DATALAYER_AUDIT_PROMPT
+from prompts import DATALAYER_AUDIT_SYSTEM, DATALAYER_AUDIT_PROMPT, DATALAYER_RULES_CONTEXT
+from auditors.datalayer_stream import (profile_datalayer, run_datalayer_checks,
+                                       is_file_source, MAX_RAW_CHARS)
+from auditors.findings import format_rule_findings
+from auditors.sharding import audit_section, line_block
+from telemetry import timed, span
 
-def audit_datalayer(setup):
+@timed("audit", section="datalayer")
+def audit_datalayer(setup, bypass_cache=False, on_finding=None):
     """Audit dataLayer quality based on user's setup"""
     
-    datalayer_data = setup.get("datalayer_sample", "")
+    # Pasted text, a DumpFile (CLI "@file" / "-") or a file-like upload
+    source = setup.get("datalayer_sample", "")
+    
+    # Stream the dump one push at a time; large dumps reach the model as a bounded profile
+    datalayer_data = ""
+    rule_findings = []
+    rule_context = ""
+    if source:
+        with span("rules"):
+            profile = profile_datalayer(source)
+            rule_findings = run_datalayer_checks(profile)
+        if on_finding:
+            for finding in rule_findings:
+                on_finding(finding)
+        if rule_findings:
+            rule_context = DATALAYER_RULES_CONTEXT.format(rule_findings=format_rule_findings(rule_findings))
+        if not profile.pushes:
+            # Not a JSON array: pasted text is sent whole (sharded if needed), files as a preview
+            datalayer_data = profile.raw_preview if is_file_source(source) else source
+        elif is_file_source(source) or len(source) > MAX_RAW_CHARS:
+            datalayer_data = profile.digest()
+        else:
+            datalayer_data = source
     
     if not datalayer_data:
         datalayer_data = f"""No dataLayer sample provided.
         Based on a {setup['website_type']} in {setup['industry']} using {setup['platform']},
         provide a recommended dataLayer structure and flag what to watch for."""
     
-    prompt = DATALAYER_AUDIT_PROMPT.format(
-        website_type=setup["website_type"],
-        datalayer_data=datalayer_data
-    )
-    
-    response = client.messages.create(
-        model=MODEL,
-        max_tokens=MAX_TOKENS,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    
-    response_text = response.content[0].text
+    def build_prompt(section_data, findings_count):
+        return DATALAYER_AUDIT_PROMPT.format(
+            website_type=setup["website_type"],
+            datalayer_data=section_data,
+            rule_context=rule_context,
+            findings_count=findings_count
+        )
     
-    cleaned = response_text.strip()
-    if cleaned.startswith("```"):
-        lines = cleaned.split("\n")
-        cleaned = "\n".join(lines[1:-1])
+    data, response_text = audit_section(build_prompt, datalayer_data, line_block, "datalayer",
+                                        rule_findings=len(rule_findings), system=DATALAYER_AUDIT_SYSTEM,
+                                        bypass_cache=bypass_cache, on_finding=on_finding)
     
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        return {
-            "findings": [{"issue": "Failed to parse dataLayer audit", "severity": "info",
-                         "category": "config", "details": response_text,
-                         "fix": "Re-run audit", "business_impact": "N/A"}],
-            "score": 0,
-            "summary": "Audit parsing failed — raw response saved in details"
-        }
\ No newline at end of file
+    if data is not None:
+        data["findings"] = rule_findings + data.get("findings", [])
+        return data
+    return {
+        "findings": rule_findings + [{"issue": "Failed to parse dataLayer audit", "severity": "info",
+                     "category": "config", "details": response_text,
+                     "fix": "Re-run audit", "business_impact": "N/A"}],
+        "score": 0,
+        "summary": "Audit parsing failed — raw response saved in details",
+        "audit_failed": True
+    }
\ No newline at end of file
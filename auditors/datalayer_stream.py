@@ -0,0 +1,242 @@
+# DataLayer Stream - reads large dataLayer dumps one push at a time and profiles them
+import codecs
+import contextlib
+import json
+import re
+import sys
+from collections import Counter
+from jsonstream import ArrayItemStream
+from auditors.findings import make_finding, name_list
+
+CHUNK_SIZE = 64 * 1024
+
+# Bounds on what the profile keeps, independent of dump size
+MAX_TRACKED_KEYS = 500
+MAX_SAMPLE_PUSHES = 12
+MAX_SAMPLE_CHARS = 600
+MAX_RAW_CHARS = 20000
+
+EMAIL = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PHONE = re.compile(r"^\+?[\d\s().-]{7,}\d$")
+HASHED = re.compile(r"^[a-f0-9]{32,}$", re.I)
+PHONE_KEYS = re.compile(r"(^|_|\.)(phone|phone_?number|tel|mobile)$", re.I)
+PERSONAL_KEYS = re.compile(r"(^|_|\.)(first_?name|last_?name|full_?name|address|street|zip|postal_?code)$", re.I)
+NUMERIC_KEYS = re.compile(r"(price|value|revenue|tax|shipping|quantity|total|amount)$", re.I)
+NUMERIC_STRING = re.compile(r"^-?\d+(\.\d+)?$")
+CAMEL_CASE = re.compile(r"^[a-z]+[A-Z][A-Za-z0-9]*$")
+SNAKE_CASE = re.compile(r"^[a-z][a-z0-9]*(_[a-z0-9]+)+$")
+
+
+class DumpFile:
+    """A dataLayer dump to stream from disk, or from stdin when path is "-".
+
+    Only the CLI and batch entry points create these (from "@path" and "-"
+    arguments); plain strings always reach the auditor as pasted text.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __repr__(self):
+        return f"DumpFile({self.path!r})"
+
+    def open(self):
+        """Text stream of the dump; stdin is returned as-is and must not be closed"""
+        if self.path == "-":
+            return contextlib.nullcontext(sys.stdin)
+        return open(self.path, "r", encoding="utf-8")
+
+
+def read_chunks(source, chunk_size=CHUNK_SIZE):
+    """Yield text chunks from a dataLayer source without reading it all at once.
+
+    source may be pasted text, a DumpFile, or any file-like object opened
+    in text or binary mode (e.g. a Streamlit upload).
+    """
+    if not source:
+        return
+    if isinstance(source, str):
+        for i in range(0, len(source), chunk_size):
+            yield source[i:i + chunk_size]
+        return
+    if isinstance(source, DumpFile):
+        with source.open() as f:
+            yield from read_chunks(f, chunk_size)
+        return
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        yield decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def is_file_source(source):
+    """True when the source is a DumpFile or a stream rather than pasted text"""
+    return isinstance(source, DumpFile) or hasattr(source, "read")
+
+
+class DataLayerProfile:
+    """Accumulates a bounded summary of dataLayer pushes as they stream past"""
+
+    def __init__(self):
+        self.pushes = 0
+        self.events = Counter()
+        self.keys = Counter()
+        self.key_types = {}
+        self.key_styles = Counter()
+        self.pii = Counter()
+        self.numeric_strings = Counter()
+        self.ecommerce_pushes = 0
+        self.ecommerce_without_items = 0
+        self.samples = []
+        self._sampled_events = set()
+        self.raw_preview = ""
+
+    def add(self, push):
+        self.pushes += 1
+        if not isinstance(push, dict):
+            self._track_key("(non-object push)", type(push).__name__)
+            return
+
+        event = push.get("event")
+        self.events[event if isinstance(event, str) else "(no event key)"] += 1
+
+        ecommerce = push.get("ecommerce")
+        if isinstance(ecommerce, dict):
+            self.ecommerce_pushes += 1
+            if not isinstance(ecommerce.get("items"), list):
+                self.ecommerce_without_items += 1
+
+        for path, leaf_key, value in _walk(push):
+            self._track_key(path, type(value).__name__)
+            if leaf_key and not leaf_key.startswith("gtm"):
+                if CAMEL_CASE.match(leaf_key):
+                    self.key_styles["camelCase"] += 1
+                elif SNAKE_CASE.match(leaf_key):
+                    self.key_styles["snake_case"] += 1
+            if isinstance(value, str):
+                if _looks_like_pii(path, value):
+                    _bump(self.pii, path)
+                if NUMERIC_KEYS.search(leaf_key or "") and NUMERIC_STRING.match(value.strip()):
+                    _bump(self.numeric_strings, path)
+
+        if event not in self._sampled_events and len(self.samples) < MAX_SAMPLE_PUSHES:
+            self._sampled_events.add(event)
+            sample = json.dumps(push, ensure_ascii=False)
+            if len(sample) > MAX_SAMPLE_CHARS:
+                sample = sample[:MAX_SAMPLE_CHARS] + "...(truncated)"
+            self.samples.append(sample)
+
+    def _track_key(self, path, type_name):
+        if _bump(self.keys, path):
+            self.key_types.setdefault(path, set()).add(type_name)
+
+    def digest(self):
+        """Compact, size-bounded description of the dump for the LLM"""
+        lines = [
+            f"DATALAYER DUMP PROFILE: {self.pushes} pushes streamed, {len(self.events)} distinct events",
+            "EVENTS (count): " + (", ".join(f"{e} x{n}" for e, n in self.events.most_common(40)) or "none"),
+            "KEY PATHS (occurrences, types):"
+        ]
+        for path, n in self.keys.most_common(60):
+            lines.append(f"- {path}: {n} ({'/'.join(sorted(self.key_types[path]))})")
+        lines.append("KEY NAMING: " + (", ".join(f"{s} x{n}" for s, n in self.key_styles.most_common()) or "n/a"))
+        lines.append(f"ECOMMERCE: {self.ecommerce_pushes} pushes with an ecommerce object, "
+                     f"{self.ecommerce_without_items} without an items array")
+        lines.append("SAMPLE PUSHES (first push of each event):")
+        lines.extend(self.samples)
+        return "\n".join(lines)
+
+
+def _bump(counter, path):
+    """Count path unless the counter is already tracking MAX_TRACKED_KEYS others"""
+    if path in counter or len(counter) < MAX_TRACKED_KEYS:
+        counter[path] += 1
+        return True
+    return False
+
+
+def _walk(node, prefix=""):
+    """Yield (path, leaf_key, value) for every leaf in a push, iteratively"""
+    stack = [(prefix, None, node)]
+    while stack:
+        path, key, value = stack.pop()
+        if isinstance(value, dict):
+            for k, v in value.items():
+                stack.append((f"{path}.{k}" if path else str(k), str(k), v))
+        elif isinstance(value, list):
+            for v in value:
+                stack.append((f"{path}[]", key, v))
+        else:
+            yield path, key, value
+
+
+def _looks_like_pii(path, value):
+    value = value.strip()
+    if not value or HASHED.match(value):
+        return False
+    if EMAIL.search(value):
+        return True
+    if PHONE_KEYS.search(path):
+        return bool(PHONE.match(value))
+    return bool(PERSONAL_KEYS.search(path))
+
+
+def profile_datalayer(source, chunk_size=CHUNK_SIZE):
+    """Stream a dataLayer source push by push into a DataLayerProfile.
+
+    If the source isn't a JSON array (e.g. a single object or JS snippet),
+    the profile is empty and raw_preview holds the first MAX_RAW_CHARS of it.
+    """
+    profile = DataLayerProfile()
+    stream = ArrayItemStream()
+    preview = []
+    preview_len = 0
+    for chunk in read_chunks(source, chunk_size):
+        if preview_len < MAX_RAW_CHARS:
+            preview.append(chunk[:MAX_RAW_CHARS - preview_len])
+            preview_len += len(preview[-1])
+        for push in stream.feed(chunk):
+            profile.add(push)
+        if stream.done:
+            break
+    if profile.pushes == 0:
+        profile.raw_preview = "".join(preview)
+    return profile
+
+
+def run_datalayer_checks(profile):
+    """Deterministic PII and data-type checks over the streamed profile"""
+    findings = []
+    if profile.pii:
+        paths = [p for p, _ in profile.pii.most_common()]
+        findings.append(make_finding(
+            f"PII exposure in dataLayer: {name_list(paths, limit=5)}",
+            "critical",
+            f"Plain-text personal data (emails, names, phone numbers or addresses) was found in "
+            f"{sum(profile.pii.values())} values across {len(paths)} keys: {name_list(paths)}. "
+            "Every tag in the container can read the dataLayer.",
+            "Remove personal data from dataLayer pushes. Where a tag needs it (e.g. Enhanced "
+            "Conversions), push only a SHA-256 hash generated server-side.",
+            "GDPR/CCPA violation risk and liability if any third-party tag leaks the data.",
+            category="pii",
+        ))
+    if profile.numeric_strings:
+        paths = [p for p, _ in profile.numeric_strings.most_common()]
+        findings.append(make_finding(
+            "Numeric values pushed as strings",
+            "high",
+            f"{sum(profile.numeric_strings.values())} price/value/quantity fields were strings "
+            f"instead of numbers: {name_list(paths)}.",
+            "Push numbers (e.g. value: 49.99, not '49.99'); convert with parseFloat()/parseInt() "
+            "before the dataLayer.push.",
+            "GA4 may drop or mis-aggregate string revenue and quantity values, corrupting revenue "
+            "and ROAS reporting.",
+            category="data_types",
+        ))
+    return findings
@@ -0,0 +1,22 @@
+# Shared helpers for findings produced by local (non-LLM) checks
+
+
+def make_finding(issue, severity, details, fix, business_impact, category):
+    """Build a finding in the audit schema, tagged as coming from a local check"""
+    return {
+        "issue": issue, "severity": severity, "category": category,
+        "details": details, "fix": fix, "business_impact": business_impact,
+        "source": "rules"
+    }
+
+
+def name_list(names, limit=10):
+    """Quote up to limit names, noting how many more were left out"""
+    names = list(names)
+    shown = ", ".join(f"'{n}'" for n in names[:limit])
+    return shown + (f" (+{len(names) - limit} more)" if len(names) > limit else "")
+
+
+def format_rule_findings(findings):
+    """Render local findings as a compact bullet list for a prompt"""
+    return "\n".join(f"- [{f['severity']}] {f['issue']}" for f in findings)
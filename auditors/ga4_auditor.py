@@ -1,14 +1,27 @@
 # GA4 Event Coverage Auditor
-import json
-from config import client, MODEL, MAX_TOKENS
-from prompts import GA4_AUDIT_PROMPT
+from prompts import GA4_AUDIT_SYSTEM, GA4_AUDIT_PROMPT, GA4_RULES_CONTEXT
+from auditors.ga4_rules import run_ga4_rules
+from auditors.findings import format_rule_findings
+from auditors.sharding import audit_section, event_family
+from telemetry import timed, span
 
-def audit_ga4(setup):
+@timed("audit", section="ga4")
+def audit_ga4(setup, bypass_cache=False, on_finding=None):
     """Audit GA4 event coverage based on user's setup"""
     
     # Build context from what the user provided
     ga4_data = setup.get("ga4_events", "")
     
+    # Mechanical checks run locally first and are reported straight away
+    with span("rules"):
+        rule_findings = run_ga4_rules(ga4_data, setup)
+    if on_finding:
+        for finding in rule_findings:
+            on_finding(finding)
+    rule_context = ""
+    if rule_findings:
+        rule_context = GA4_RULES_CONTEXT.format(rule_findings=format_rule_findings(rule_findings))
+    
     if not ga4_data:
         # If no GA4 data pasted, use the setup info to do a general audit
         ga4_data = f"""No specific event list provided. 
@@ -20,34 +33,29 @@ def audit_ga4(setup):
         
         Please recommend what events SHOULD exist and flag them as missing."""
     
-    prompt = GA4_AUDIT_PROMPT.format(
-        industry=setup["industry"],
-        website_type=setup["website_type"],
-        goals=", ".join(setup["goals"]),
-        ga4_data=ga4_data
-    )
-    
-    response = client.messages.create(
-        model=MODEL,
-        max_tokens=MAX_TOKENS,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    
-    response_text = response.content[0].text
+    def build_prompt(section_data, findings_count):
+        return GA4_AUDIT_PROMPT.format(
+            industry=setup["industry"],
+            website_type=setup["website_type"],
+            goals=", ".join(setup["goals"]),
+            ga4_data=section_data,
+            rule_context=rule_context,
+            findings_count=findings_count
+        )
     
-    # Clean markdown code blocks if present
-    cleaned = response_text.strip()
-    if cleaned.startswith("```"):
-        lines = cleaned.split("\n")
-        cleaned = "\n".join(lines[1:-1])
+    # Oversized event lists are audited per event family and merged
+    data, response_text = audit_section(build_prompt, ga4_data, event_family, "ga4",
+                                        rule_findings=len(rule_findings), system=GA4_AUDIT_SYSTEM,
+                                        bypass_cache=bypass_cache, on_finding=on_finding)
     
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        return {
-            "findings": [{"issue": "Failed to parse GA4 audit", "severity": "info", 
-                         "category": "config", "details": response_text,
-                         "fix": "Re-run audit", "business_impact": "N/A"}],
-            "score": 0,
-            "summary": "Audit parsing failed — raw response saved in details"
-        }
\ No newline at end of file
+    if data is not None:
+        data["findings"] = rule_findings + data.get("findings", [])
+        return data
+    return {
+        "findings": rule_findings + [{"issue": "Failed to parse GA4 audit", "severity": "info", 
+                     "category": "config", "details": response_text,
+                     "fix": "Re-run audit", "business_impact": "N/A"}],
+        "score": 0,
+        "summary": "Audit parsing failed — raw response saved in details",
+        "audit_failed": True
+    }
\ No newline at end of file
@@ -0,0 +1,208 @@
+# GA4 Rule Engine - deterministic checks that don't need the LLM
+import json
+import re
+from auditors.findings import make_finding, name_list
+
+# GA4 collection limits
+MAX_EVENT_NAME_LENGTH = 40
+MAX_PARAM_NAME_LENGTH = 40
+MAX_PARAMS_PER_EVENT = 25
+
+# Names GA4 reserves for automatically collected events; custom events using them are dropped
+RESERVED_EVENT_NAMES = {
+    "ad_activeview", "ad_click", "ad_exposure", "ad_impression", "ad_query", "ad_reward",
+    "adunit_exposure", "app_background", "app_clear_data", "app_exception", "app_remove",
+    "app_store_refund", "app_store_subscription_cancel", "app_store_subscription_convert",
+    "app_store_subscription_renew", "app_update", "app_upgrade", "dynamic_link_app_open",
+    "dynamic_link_app_update", "dynamic_link_first_open", "error", "first_open", "first_visit",
+    "in_app_purchase", "notification_dismiss", "notification_foreground", "notification_open",
+    "notification_receive", "os_update", "session_start", "session_start_with_rollout",
+    "user_engagement"
+}
+RESERVED_PREFIXES = ("_", "firebase_", "ga_", "google_", "gtag.")
+
+SNAKE_CASE = re.compile(r"^[a-z][a-z0-9_]*$")
+
+# Recommended funnel events per industry; the last entry is the key conversion
+ECOMMERCE_FUNNEL = ["view_item_list", "view_item", "add_to_cart", "begin_checkout",
+                    "add_shipping_info", "add_payment_info", "purchase"]
+INDUSTRY_FUNNELS = {
+    "E-commerce / Retail": ECOMMERCE_FUNNEL,
+    "Travel / Hospitality": ["search", "view_item", "begin_checkout", "add_payment_info", "purchase"],
+    "SaaS / Software": ["login", "sign_up"],
+    "Lead Generation / B2B": ["form_start", "form_submit", "generate_lead"],
+    "Media / Publishing": ["page_view", "scroll", "select_content"]
+}
+
+_HEADER_CELLS = {"event", "events", "event name", "event_name", "name", "count", "users"}
+_BULLET = re.compile(r"^\s*(?:[-*•]+|\d+[.)])\s*")
+
+
+def parse_event_list(ga4_data):
+    """Extract {event_name: [param names]} from pasted GA4 event data.
+
+    Accepts JSON (a list of names, a list of {"name"/"event", "params"}
+    objects, or a name -> params mapping), a GA4 Admin > Events table copy,
+    or a measurement-plan style list ("purchase: transaction_id, value").
+    """
+    try:
+        parsed = json.loads(ga4_data)
+    except (json.JSONDecodeError, TypeError):
+        parsed = None
+    if isinstance(parsed, (list, dict)):
+        return _events_from_json(parsed)
+
+    events = {}
+    for raw in ga4_data.splitlines():
+        line = _BULLET.sub("", raw).strip()
+        if not line or line.endswith(":"):
+            continue
+
+        params = []
+        if "(" in line and line.rstrip().endswith(")"):
+            name, _, rest = line.partition("(")
+            params = _split_params(rest.rstrip(")"))
+            names = [name]
+        elif ":" in line:
+            name, _, rest = line.partition(":")
+            params = _split_params(rest)
+            names = [name]
+        elif "\t" in line or "|" in line:
+            names = [re.split(r"[\t|]", line.strip("|"))[0]]
+        else:
+            names = line.split(",")
+
+        for name in names:
+            name = name.strip().strip("`'\"")
+            # Skip table headers and prose lines
+            if not name or name.lower() in _HEADER_CELLS or len(name.split()) > 4:
+                continue
+            events.setdefault(name, []).extend(p for p in params if p not in events.get(name, []))
+    return events
+
+
+def _events_from_json(parsed):
+    events = {}
+    if isinstance(parsed, dict):
+        items = [{"name": k, "params": v} for k, v in parsed.items()]
+    else:
+        items = parsed
+    for item in items:
+        if isinstance(item, str):
+            events.setdefault(item, [])
+        elif isinstance(item, dict):
+            name = item.get("name") or item.get("event_name") or item.get("event")
+            if not isinstance(name, str):
+                continue
+            params = item.get("params") or item.get("parameters") or []
+            if isinstance(params, dict):
+                params = list(params)
+            events.setdefault(name, []).extend(p for p in params if isinstance(p, str))
+    return events
+
+
+def _split_params(text):
+    return [p.strip().strip("`'\"") for p in re.split(r"[,\s]+", text) if p.strip()]
+
+
+def run_ga4_rules(ga4_data, setup):
+    """Run the deterministic GA4 checks and return findings in the audit schema.
+
+    Returns an empty list when no event list was provided, since there is
+    nothing concrete to check.
+    """
+    if not ga4_data or not ga4_data.strip():
+        return []
+    events = parse_event_list(ga4_data)
+    if not events:
+        return []
+
+    names = list(events)
+    findings = []
+
+    reserved = [n for n in names if n in RESERVED_EVENT_NAMES]
+    prefixed = [n for n in names if n.startswith(RESERVED_PREFIXES)]
+    if reserved or prefixed:
+        offenders = reserved + [n for n in prefixed if n not in reserved]
+        findings.append(make_finding(
+            f"Reserved GA4 event names or prefixes in use: {name_list(offenders)}",
+            "critical",
+            f"GA4 reserves these names for automatically collected events, and names starting with "
+            f"{', '.join(RESERVED_PREFIXES)} are reserved for Google. Custom events using them are "
+            f"rejected at collection time. Offending events: {name_list(offenders)}.",
+            "Rename each event to a unique snake_case name (e.g. 'error' -> 'form_error') in the GTM "
+            "tag or gtag() call, then verify in DebugView that the renamed event arrives.",
+            "Every hit sent with these names is silently discarded, so the behaviour they were meant "
+            "to measure is missing from all reports.",
+            category="naming",
+        ))
+
+    too_long = [n for n in names if len(n) > MAX_EVENT_NAME_LENGTH]
+    if too_long:
+        findings.append(make_finding(
+            f"Event names exceed GA4's {MAX_EVENT_NAME_LENGTH}-character limit",
+            "high",
+            f"GA4 does not collect events whose names are longer than {MAX_EVENT_NAME_LENGTH} "
+            f"characters. Offending events: {name_list(too_long)}.",
+            f"Shorten each name to {MAX_EVENT_NAME_LENGTH} characters or fewer and move detail into "
+            "event parameters instead of the event name.",
+            "These events never reach GA4 reports, leaving gaps that look like zero activity.",
+            category="limits",
+        ))
+
+    not_snake = [n for n in names if not SNAKE_CASE.match(n) and n not in too_long]
+    if not_snake:
+        findings.append(make_finding(
+            "Event names violate the snake_case naming convention",
+            "medium",
+            "GA4 event names are case-sensitive and should be lowercase snake_case (letters, digits "
+            f"and underscores, starting with a letter). Offending events: {name_list(not_snake)}.",
+            "Rename events to lowercase snake_case (e.g. 'Add To Cart' -> 'add_to_cart'), prefer GA4 "
+            "recommended event names where one exists, and document the convention in the "
+            "measurement plan.",
+            "Inconsistent casing splits the same action across several event names, fragmenting "
+            "reports and breaking recommended-event integrations.",
+            category="naming",
+        ))
+
+    long_params = sorted({p for params in events.values() for p in params if len(p) > MAX_PARAM_NAME_LENGTH})
+    too_many = [n for n, params in events.items() if len(params) > MAX_PARAMS_PER_EVENT]
+    if long_params or too_many:
+        parts = []
+        if long_params:
+            parts.append(f"parameter names over {MAX_PARAM_NAME_LENGTH} characters: {name_list(long_params)}")
+        if too_many:
+            parts.append(f"events with more than {MAX_PARAMS_PER_EVENT} parameters: {name_list(too_many)}")
+        findings.append(make_finding(
+            "Event parameters exceed GA4 collection limits",
+            "high",
+            "GA4 drops parameters beyond its limits. Found " + "; ".join(parts) + ".",
+            f"Keep parameter names within {MAX_PARAM_NAME_LENGTH} characters and send at most "
+            f"{MAX_PARAMS_PER_EVENT} parameters per event; move rarely used detail into items "
+            "arrays or user properties.",
+            "Dropped parameters silently remove dimensions from reports and custom definitions.",
+            category="limits",
+        ))
+
+    funnel = INDUSTRY_FUNNELS.get(setup.get("industry"))
+    if funnel is None and setup.get("website_type") == "E-commerce store":
+        funnel = ECOMMERCE_FUNNEL
+    if funnel:
+        present = set(names)
+        missing = [e for e in funnel if e not in present]
+        if missing:
+            conversion_missing = funnel[-1] in missing
+            findings.append(make_finding(
+                f"Recommended funnel events missing: {name_list(missing)}",
+                "critical" if conversion_missing else "high",
+                f"For {setup.get('industry') or setup.get('website_type')}, GA4's recommended funnel "
+                f"is {' -> '.join(funnel)}. The pasted event list has no {name_list(missing)}.",
+                "Implement the missing events with GA4's recommended names and required parameters, "
+                "pushed from the dataLayer and sent via GTM GA4 Event tags.",
+                "Funnel steps without events cannot be measured, so drop-off between them is "
+                "invisible and conversion optimisation is guesswork.",
+                category="ecommerce_gap" if funnel is ECOMMERCE_FUNNEL else "missing_event",
+            ))
+
+    return findings
+
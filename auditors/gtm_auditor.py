@@ -1,41 +1,64 @@
 # GTM Container Health Auditor
-import json
-from config import client, MODEL, MAX_TOKENS
-from prompts import GTM_AUDIT_PROMPT
+from prompts import GTM_AUDIT_SYSTEM, GTM_AUDIT_PROMPT, GTM_RULES_CONTEXT
+from auditors.gtm_container import (load_container, run_gtm_checks, digest_header, digest_tag_lines,
+                                    summarise_tag_lines)
+from auditors.findings import format_rule_findings
+from auditors.sharding import audit_section, tag_group
+from telemetry import timed, span
 
-def audit_gtm(setup):
+@timed("audit", section="gtm")
+def audit_gtm(setup, bypass_cache=False, on_finding=None):
     """Audit GTM container health based on user's setup"""
     
     gtm_data = setup.get("gtm_tags", "")
     
+    # A full container export is indexed and checked locally; the model only sees a digest,
+    # one line per tag
+    rule_findings = []
+    rule_context = ""
+    header = ""
+    with span("rules"):
+        container = load_container(gtm_data)
+        if container is not None:
+            rule_findings = run_gtm_checks(container)
+    if container is not None:
+        if on_finding:
+            for finding in rule_findings:
+                on_finding(finding)
+        header = digest_header(container)
+        gtm_data = "\n".join(digest_tag_lines(container))
+        rule_context = GTM_RULES_CONTEXT.format(
+            rule_findings=format_rule_findings(rule_findings) or "- No structural issues found"
+        )
+    
     if not gtm_data:
         gtm_data = f"""No specific GTM data provided.
         Based on a {setup['website_type']} in {setup['industry']},
         using {setup['platform']}, provide a general GTM health checklist
         and flag common issues for this type of setup."""
     
-    prompt = GTM_AUDIT_PROMPT.format(gtm_data=gtm_data)
-    
-    response = client.messages.create(
-        model=MODEL,
-        max_tokens=MAX_TOKENS,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    
-    response_text = response.content[0].text
+    def build_prompt(section_data, findings_count):
+        return GTM_AUDIT_PROMPT.format(
+            gtm_data=section_data,
+            rule_context=rule_context,
+            findings_count=findings_count
+        )
     
-    cleaned = response_text.strip()
-    if cleaned.startswith("```"):
-        lines = cleaned.split("\n")
-        cleaned = "\n".join(lines[1:-1])
+    # Oversized containers are audited per tag group (naming prefix) and merged; past
+    # MAX_SHARDS shards the tags that don't fit a shard are summarised by type
+    data, response_text = audit_section(build_prompt, gtm_data, tag_group, "gtm", header=header,
+                                        rule_findings=len(rule_findings), system=GTM_AUDIT_SYSTEM,
+                                        bypass_cache=bypass_cache, on_finding=on_finding,
+                                        summarise=summarise_tag_lines if container is not None else None)
     
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        return {
-            "findings": [{"issue": "Failed to parse GTM audit", "severity": "info",
-                         "category": "config", "details": response_text,
-                         "fix": "Re-run audit", "business_impact": "N/A"}],
-            "score": 0,
-            "summary": "Audit parsing failed — raw response saved in details"
-        }
\ No newline at end of file
+    if data is not None:
+        data["findings"] = rule_findings + data.get("findings", [])
+        return data
+    return {
+        "findings": rule_findings + [{"issue": "Failed to parse GTM audit", "severity": "info",
+                     "category": "config", "details": response_text,
+                     "fix": "Re-run audit", "business_impact": "N/A"}],
+        "score": 0,
+        "summary": "Audit parsing failed — raw response saved in details",
+        "audit_failed": True
+    }
\ No newline at end of file
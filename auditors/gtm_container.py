@@ -0,0 +1,275 @@
+# GTM Container Parser - indexes an official GTM export and runs the structural checks locally
+import json
+import re
+from collections import Counter, defaultdict
+from auditors.findings import make_finding, name_list
+
+# Built-in triggers referenced by id but never listed in the export
+BUILT_IN_TRIGGERS = {
+    "2147479553": "All Pages",
+    "2147479572": "Consent Initialization - All Pages",
+    "2147479573": "Initialization - All Pages"
+}
+
+TAG_TYPE_LABELS = {
+    "gaawc": "GA4 Configuration",
+    "googtag": "Google Tag",
+    "gaawe": "GA4 Event",
+    "ua": "Universal Analytics",
+    "html": "Custom HTML",
+    "img": "Custom Image",
+    "awct": "Google Ads Conversion",
+    "sp": "Google Ads Remarketing",
+    "gclidw": "Conversion Linker",
+    "flc": "Floodlight Counter",
+    "fls": "Floodlight Sales"
+}
+GA4_CONFIG_TYPES = {"gaawc", "googtag"}
+
+MAX_CUSTOM_HTML_TAGS = 10
+
+_VARIABLE_REF = re.compile(r"\{\{([^{}]+)\}\}")
+
+
+class GTMContainer:
+    """Indexed view of a GTM container export.
+
+    Builds, in one pass over each list: tags and triggers by id, variables
+    by name, a reverse trigger -> tag map, and the set of variable names each
+    tag, trigger and variable references via {{...}}.
+    """
+
+    def __init__(self, container_version):
+        self.info = container_version.get("container", {})
+        self.version_id = container_version.get("containerVersionId")
+        self.tags_by_id = {}
+        self.triggers_by_id = {}
+        self.variables_by_name = {}
+        self.trigger_to_tags = defaultdict(list)
+        self.blocking_trigger_to_tags = defaultdict(list)
+        self.variable_refs = defaultdict(set)
+        self.sequenced_tag_names = set()
+
+        for tag in container_version.get("tag", []):
+            tag_id = str(tag.get("tagId"))
+            self.tags_by_id[tag_id] = tag
+            for trigger_id in tag.get("firingTriggerId", []):
+                self.trigger_to_tags[str(trigger_id)].append(tag_id)
+            for trigger_id in tag.get("blockingTriggerId", []):
+                self.blocking_trigger_to_tags[str(trigger_id)].append(tag_id)
+            for link in tag.get("setupTag", []) + tag.get("teardownTag", []):
+                self.sequenced_tag_names.add(link.get("tagName"))
+            self._index_refs(f"tag:{tag_id}", tag.get("parameter", []))
+
+        for trigger in container_version.get("trigger", []):
+            trigger_id = str(trigger.get("triggerId"))
+            self.triggers_by_id[trigger_id] = trigger
+            self._index_refs(f"trigger:{trigger_id}", trigger)
+
+        for variable in container_version.get("variable", []):
+            name = variable.get("name")
+            self.variables_by_name[name] = variable
+            self._index_refs(f"variable:{name}", variable.get("parameter", []))
+
+        self.built_in_variables = [v.get("name") for v in container_version.get("builtInVariable", [])]
+
+    def _index_refs(self, owner, node):
+        for value in _iter_strings(node):
+            for name in _VARIABLE_REF.findall(value):
+                self.variable_refs[name].add(owner)
+
+    # --- Lookups ---
+
+    def tag_type(self, tag):
+        return TAG_TYPE_LABELS.get(tag.get("type"), tag.get("type", "unknown"))
+
+    def trigger_name(self, trigger_id):
+        trigger_id = str(trigger_id)
+        if trigger_id in BUILT_IN_TRIGGERS:
+            return BUILT_IN_TRIGGERS[trigger_id]
+        return self.triggers_by_id.get(trigger_id, {}).get("name", f"#{trigger_id}")
+
+    def active_tags(self):
+        return [t for t in self.tags_by_id.values() if not t.get("paused")]
+
+    # --- Structural checks ---
+
+    def duplicate_ga4_configs(self):
+        """Active GA4 config / Google tags grouped by measurement ID, where more than one shares it"""
+        by_id = defaultdict(list)
+        for tag in self.active_tags():
+            if tag.get("type") in GA4_CONFIG_TYPES:
+                measurement_id = _param(tag, "measurementId") or _param(tag, "tagId") or "(not set)"
+                by_id[measurement_id].append(tag.get("name"))
+        return {mid: names for mid, names in by_id.items() if len(names) > 1}
+
+    def tags_without_triggers(self):
+        return [t.get("name") for t in self.active_tags()
+                if not t.get("firingTriggerId") and t.get("name") not in self.sequenced_tag_names]
+
+    def unused_triggers(self):
+        return [t.get("name") for tid, t in self.triggers_by_id.items()
+                if tid not in self.trigger_to_tags and tid not in self.blocking_trigger_to_tags]
+
+    def unused_variables(self):
+        return [name for name in self.variables_by_name if not self.variable_refs.get(name)]
+
+    def custom_html_tags(self):
+        return [t.get("name") for t in self.tags_by_id.values() if t.get("type") == "html"]
+
+
+def _iter_strings(node):
+    """Yield every string value nested anywhere in a GTM parameter structure"""
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            yield item
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+
+
+def _param(tag, key):
+    for param in tag.get("parameter", []):
+        if param.get("key") == key:
+            return param.get("value")
+    return None
+
+
+def load_container(gtm_data):
+    """Parse pasted text as a GTM container export; returns None if it isn't one"""
+    text = gtm_data.strip() if gtm_data else ""
+    if not text.startswith("{"):
+        return None
+    try:
+        export = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(export, dict):
+        return None
+    container_version = export.get("containerVersion", export)
+    if not isinstance(container_version, dict) or "tag" not in container_version:
+        return None
+    return GTMContainer(container_version)
+
+
+def run_gtm_checks(container):
+    """Run the structural GTM checks and return findings in the audit schema"""
+    findings = []
+
+    for measurement_id, names in container.duplicate_ga4_configs().items():
+        findings.append(make_finding(
+            f"Duplicate GA4 configuration tags for {measurement_id}",
+            "critical",
+            f"{len(names)} active GA4 configuration / Google tags send to {measurement_id}: "
+            f"{name_list(names)}. Each one initialises GA4 and sends its own page_view.",
+            "Keep a single configuration tag per measurement ID, pause or delete the others, "
+            "confirm one page_view per page load in GA4 DebugView, then publish.",
+            "Sessions, pageviews and engagement metrics are inflated, so every GA4 report built "
+            "on them is unreliable.",
+            category="duplicate",
+        ))
+
+    no_triggers = container.tags_without_triggers()
+    if no_triggers:
+        findings.append(make_finding(
+            f"{len(no_triggers)} active tags have no firing triggers",
+            "high",
+            f"These tags are not paused but have no firing trigger and are not used as setup or "
+            f"cleanup tags, so they never fire: {name_list(no_triggers)}.",
+            "Attach the intended trigger to each tag, or delete it if it is no longer needed.",
+            "Tracking the team believes is live is actually missing, and dead tags add noise to "
+            "every container review.",
+            category="dead_code",
+        ))
+
+    unused_triggers = container.unused_triggers()
+    if unused_triggers:
+        findings.append(make_finding(
+            f"{len(unused_triggers)} triggers are not used by any tag",
+            "low",
+            f"No tag fires on or is blocked by these triggers: {name_list(unused_triggers)}.",
+            "Delete unused triggers (or attach them to the tag they were created for) to keep the "
+            "container maintainable.",
+            "Unused triggers slow down container maintenance and make misconfiguration easier.",
+            category="dead_code",
+        ))
+
+    unused_variables = container.unused_variables()
+    if unused_variables:
+        findings.append(make_finding(
+            f"{len(unused_variables)} user-defined variables are never referenced",
+            "low",
+            f"No tag, trigger or other variable references these variables: {name_list(unused_variables)}.",
+            "Remove unused variables after confirming they aren't referenced from Custom HTML "
+            "via google_tag_manager[...].dataLayer.get().",
+            "Unused variables are still evaluated in some contexts and clutter the container.",
+            category="dead_code",
+        ))
+
+    html_tags = container.custom_html_tags()
+    if len(html_tags) > MAX_CUSTOM_HTML_TAGS:
+        findings.append(make_finding(
+            f"{len(html_tags)} Custom HTML tags in the container",
+            "high" if len(html_tags) > 3 * MAX_CUSTOM_HTML_TAGS else "medium",
+            f"The container has {len(html_tags)} Custom HTML tags (out of {len(container.tags_by_id)} "
+            f"tags), e.g. {name_list(html_tags, limit=5)}. Custom HTML runs arbitrary JavaScript "
+            "on every page it fires on.",
+            "Replace Custom HTML with built-in or Community Template tags where one exists, and "
+            "review the remaining scripts for error handling and third-party sources.",
+            "Each Custom HTML tag is a security and page-performance risk that bypasses GTM's "
+            "template permissions.",
+            category="security",
+        ))
+
+    return findings
+
+
+def digest_header(container):
+    """Container-level summary lines of the digest (counts, types, consent)"""
+    tags = list(container.tags_by_id.values())
+    paused = sum(1 for t in tags if t.get("paused"))
+    consent_set = sum(1 for t in tags
+                      if t.get("consentSettings", {}).get("consentStatus") in ("needed", "notNeeded"))
+    tag_types = Counter(container.tag_type(t) for t in tags)
+    trigger_types = Counter(t.get("type", "unknown") for t in container.triggers_by_id.values())
+    variable_types = Counter(v.get("type", "unknown") for v in container.variables_by_name.values())
+
+    def counts(counter):
+        return ", ".join(f"{name} x{n}" for name, n in counter.most_common())
+
+    return "\n".join([
+        f"CONTAINER: {container.info.get('name', 'N/A')} ({container.info.get('publicId', 'N/A')}), "
+        f"version {container.version_id or 'N/A'}",
+        f"TOTALS: {len(tags)} tags ({paused} paused), {len(container.triggers_by_id)} triggers, "
+        f"{len(container.variables_by_name)} user-defined variables",
+        f"TAG TYPES: {counts(tag_types) or 'none'}",
+        f"TRIGGER TYPES: {counts(trigger_types) or 'none'}",
+        f"VARIABLE TYPES: {counts(variable_types) or 'none'}",
+        f"CONSENT SETTINGS: {consent_set} of {len(tags)} tags have consent checks configured",
+        f"BUILT-IN VARIABLES: {', '.join(container.built_in_variables) or 'none'}",
+        "",
+        "TAGS (name | type | firing triggers):"
+    ]) + "\n"
+
+
+def digest_tag_lines(container):
+    """One line per tag, config and Custom HTML tags first since most judgement checks concern them"""
+    tags = sorted(container.tags_by_id.values(),
+                  key=lambda t: (t.get("type") not in GA4_CONFIG_TYPES, t.get("type") != "html"))
+    lines = []
+    for tag in tags:
+        triggers = ", ".join(container.trigger_name(tid) for tid in tag.get("firingTriggerId", [])) or "none"
+        status = " [paused]" if tag.get("paused") else ""
+        lines.append(f"- {tag.get('name')} | {container.tag_type(tag)}{status} | {triggers}")
+    return lines
+
+
+def summarise_tag_lines(lines):
+    """One line standing in for digest tag lines left out of a prompt: how many, by tag type"""
+    types = Counter(line.rsplit(" | ", 2)[-2].replace(" [paused]", "") if line.count(" | ") >= 2 else "unknown"
+                    for line in lines)
+    return (f"(+{len(lines)} more tags not shown: "
+            + ", ".join(f"{name} x{n}" for name, n in types.most_common()) + ")")
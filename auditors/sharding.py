@@ -0,0 +1,214 @@
+# Sharded Auditing - map-reduce for section inputs too large for one request
+import math
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import MAX_SECTION_INPUT_CHARS, MAX_SHARDS, SHARD_WORKERS
+from budget import output_budget
+from llm import complete_json
+from ratelimit import submit_with_context
+from prompts import SHARD_NOTE
+from schemas import AUDIT_OUTPUT
+
+SEVERITY_ORDER = {"critical": 0, "high": 1, "medium": 2, "low": 3, "info": 4}
+MAX_MERGED_FINDINGS = 12
+SUMMARY_RESERVE_CHARS = 2000
+DUPLICATE_SIMILARITY = 0.6
+
+_WORD = re.compile(r"[a-z0-9_]+")
+
+
+# --- Grouping keys: keep related lines in the same shard ---
+
+def event_family(line):
+    """Group GA4 event lines by the first word of the event name (view_*, add_*, ...)"""
+    name = line.strip().lstrip("-*• ").split()[0] if line.strip() else ""
+    return name.split("_")[0].lower() or "other"
+
+
+def tag_group(line):
+    """Group GTM tag lines by naming prefix ('GA4 - ...', 'Meta - ...') or first word"""
+    name = line.strip().lstrip("-*• ").split(" | ")[0]
+    if " - " in name:
+        return name.split(" - ")[0].strip().lower()
+    return (name.split() or ["other"])[0].lower()
+
+
+def line_block(line):
+    """No semantic grouping - used for unstructured text"""
+    return "all"
+
+
+# --- Map ---
+
+def shard_text(text, group_key, max_chars=MAX_SECTION_INPUT_CHARS, max_shards=MAX_SHARDS):
+    """Split text into shards of at most max_chars, keeping each group together where possible.
+
+    Lines are grouped by group_key (preserving first-seen order), then groups
+    are packed greedily into shards; a group bigger than a shard is split on
+    line boundaries (and a single over-long line, e.g. minified JSON, is cut
+    into pieces). There are never more than max_shards: when packing leaves
+    more, the neighbouring pair with the smallest combined size is merged
+    until they fit, so those shards may exceed max_chars. Returns a list of
+    (label, shard_text).
+    """
+    max_chars = max(max_chars, math.ceil(len(text) / max_shards))
+
+    groups = OrderedDict()
+    for line in text.splitlines():
+        if line.strip():
+            pieces = groups.setdefault(group_key(line), [])
+            pieces.extend(line[i:i + max_chars] for i in range(0, len(line), max_chars))
+
+    # Each shard is [labels, lines, size]
+    shards = []
+    current = None
+    for label, group_lines in groups.items():
+        group_size = sum(len(l) + 1 for l in group_lines)
+        if current and current[2] + group_size > max_chars:
+            current = None
+        for line in group_lines:
+            if current and current[2] + len(line) + 1 > max_chars:
+                current = None
+            if current is None:
+                current = [[], [], 0]
+                shards.append(current)
+            if label not in current[0]:
+                current[0].append(label)
+            current[1].append(line)
+            current[2] += len(line) + 1
+
+    while len(shards) > max_shards:
+        i = min(range(len(shards) - 1), key=lambda i: shards[i][2] + shards[i + 1][2])
+        first, second = shards[i], shards.pop(i + 1)
+        first[0].extend(label for label in second[0] if label not in first[0])
+        first[1].extend(second[1])
+        first[2] += second[2]
+    return [(", ".join(labels), "\n".join(lines)) for labels, lines, _ in shards]
+
+
+def fit_shard(text, max_chars, summarise):
+    """Keep the lines of text that fit in max_chars and replace the rest with summarise(omitted_lines)"""
+    if len(text) <= max_chars:
+        return text
+    lines = text.splitlines()
+    kept, size = [], 0
+    for line in lines:
+        # Room for the summary line
+        if size + len(line) + 1 > max_chars - SUMMARY_RESERVE_CHARS:
+            break
+        kept.append(line)
+        size += len(line) + 1
+    return "\n".join(kept + [summarise(lines[len(kept):])])
+
+
+def audit_section(prompt_for, data, group_key, section, header="", rule_findings=0, system=None,
+                  bypass_cache=False, on_finding=None, summarise=None):
+    """Audit one section, sharding the input when it is too large for one request.
+
+    prompt_for(section_data, findings_count) builds the per-audit prompt and
+    system is the section's static instruction prefix, shared by every shard
+    so the prompt cache serves it after the first request. Each request's
+    findings count and max_tokens come from budget.output_budget, sized to
+    that request's input (rule_findings is how many the local checks already
+    reported). Inputs within MAX_SECTION_INPUT_CHARS go out as a single
+    request; larger ones are split with shard_text, audited concurrently
+    (header is repeated in every shard) and reduced with
+    merge_section_results. The MAX_SHARDS cap can make shards larger than
+    MAX_SECTION_INPUT_CHARS; with summarise, such a shard keeps the lines
+    that fit and summarise(omitted_lines) stands in for the rest (see
+    fit_shard). Every request answers through the submit_audit tool
+    (schemas.AUDIT_OUTPUT). Returns (data, response_text) like
+    llm.complete_json; data is None only if every shard failed to parse.
+    """
+    def observe(data, response_text):
+        output_budget.observe(section, data, response_text)
+
+    def run(text, note=""):
+        budget = output_budget.plan(section, len(header) + len(text), rule_findings)
+        return complete_json(prompt_for(header + text + note, budget.findings_count),
+                             max_tokens=budget.max_tokens, system=system, output=AUDIT_OUTPUT,
+                             bypass_cache=bypass_cache, on_finding=on_finding, on_reply=observe)
+
+    if len(header) + len(data) <= MAX_SECTION_INPUT_CHARS:
+        return run(data)
+
+    max_chars = MAX_SECTION_INPUT_CHARS - len(header)
+    shards = shard_text(data, group_key, max_chars=max_chars)
+    if summarise:
+        shards = [(label, fit_shard(text, max_chars, summarise)) for label, text in shards]
+    total = len(shards)
+
+    def run_shard(index, label, text):
+        return run(text, SHARD_NOTE.format(part=index + 1, total=total, label=label))
+
+    with ThreadPoolExecutor(max_workers=max(1, SHARD_WORKERS)) as pool:
+        futures = [submit_with_context(pool, run_shard, i, label, text)
+                   for i, (label, text) in enumerate(shards)]
+        outcomes = [f.result() for f in futures]
+
+    partials = [(result, len(text)) for (result, _), (_, text) in zip(outcomes, shards) if result is not None]
+    response_text = "\n\n".join(text for _, text in outcomes)
+    if not partials:
+        return None, response_text
+    return merge_section_results(partials, total_shards=total), response_text
+
+
+# --- Reduce ---
+
+def _words(finding):
+    return set(_WORD.findall(finding.get("issue", "").lower()))
+
+
+def _similar(a, b):
+    if not a or not b:
+        return False
+    return len(a & b) / len(a | b) >= DUPLICATE_SIMILARITY
+
+
+def merge_section_results(partials, total_shards=None):
+    """Reduce per-shard results into one section result.
+
+    partials is a list of (result, weight) pairs, weighted by shard size.
+    Findings whose issue text overlaps heavily are merged (keeping the most
+    severe copy), the score is the size-weighted mean of shard scores, and
+    the list is capped to the MAX_MERGED_FINDINGS most severe findings.
+    """
+    merged = []
+    for result, _ in partials:
+        for finding in result.get("findings", []):
+            words = _words(finding)
+            for kept in merged:
+                if _similar(words, kept["words"]):
+                    severity = SEVERITY_ORDER.get(finding.get("severity"), 5)
+                    if severity < SEVERITY_ORDER.get(kept["finding"].get("severity"), 5):
+                        kept["finding"] = finding
+                    kept["count"] += 1
+                    break
+            else:
+                merged.append({"finding": finding, "words": words, "count": 1})
+
+    findings = []
+    for entry in merged:
+        finding = dict(entry["finding"])
+        if entry["count"] > 1:
+            finding["details"] = f"{finding.get('details', '')} (Reported in {entry['count']} parts of the input.)"
+        findings.append(finding)
+    findings.sort(key=lambda f: SEVERITY_ORDER.get(f.get("severity", "info"), 5))
+
+    total_weight = sum(w for _, w in partials) or 1
+    score = round(sum(r.get("score", 0) * w for r, w in partials) / total_weight)
+
+    worst = min((r for r, _ in partials), key=lambda r: r.get("score", 0))
+    shards = total_shards or len(partials)
+    summary = f"Large input audited in {shards} parts. {worst.get('summary', '')}".strip()
+    findings = findings[:MAX_MERGED_FINDINGS]
+    if len(partials) < shards:
+        findings.append({
+            "issue": f"{shards - len(partials)} of {shards} input parts could not be audited",
+            "severity": "info", "category": "config",
+            "details": "Those parts returned unparseable responses and are not reflected in the score.",
+            "fix": "Re-run the audit to retry the missing parts.", "business_impact": "N/A"
+        })
+
+    return {"findings": findings, "score": score, "summary": summary}
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Analytics Audit Tool - Batch mode
+Audits many sites headlessly from a directory of setup files or a JSONL file
+
+Usage:
+    python batch.py sites/ --out audits/
+    python batch.py sites.jsonl --out audits/ --workers 8
+
+Each setup record has the same fields the interactive intake collects:
+industry, website_type, platform, goals, ga4_events, gtm_tags and
+datalayer_sample (plus an optional "site" name). Payloads may be given inline
+or as "@relative/path" to a file relative to the setup. In directory mode
+every top-level *.json file is read as a setup, so keep payload files in a
+subdirectory (e.g. sites/shop/datalayer.json). Files or lines that aren't a
+setup record are reported as failed sites without stopping the batch. Sites
+whose results are already in the output directory for the same inputs are
+skipped, so an interrupted batch resumes where it stopped.
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+# Add project root to path so imports work
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import BATCH_WORKERS, RETRY_BUDGET
+from cache import make_key
+from dedup import visible_findings
+from intake import SETUP_DEFAULTS, PAYLOAD_FIELDS, build_setup
+from runner import SECTION_AUDITORS, run_audits, changed_sections
+from ratelimit import retry_budget, submit_with_context
+from telemetry import collect, write_prometheus
+
+RESULTS_FILE = "results.json"
+REPORT_FILE = "report.html"
+INDEX_FILE = "index.json"
+METRICS_FILE = "metrics.prom"
+INTAKE_FIELDS = tuple(SETUP_DEFAULTS) + PAYLOAD_FIELDS
+
+
+def setup_error(record):
+    """Why record can't be a setup (not a JSON object, or no intake fields); None if it can"""
+    if not isinstance(record, dict):
+        return f"expected a JSON object with intake fields, got {type(record).__name__}"
+    if not any(field in record for field in INTAKE_FIELDS):
+        return "no intake fields, so not a setup record (keep payload files in a subdirectory)"
+    return None
+
+
+def load_setups(source):
+    """Yield (site_id, setup, base_dir, error) for each setup record in a directory or JSONL file.
+
+    A file or line that can't be read or isn't a setup record is yielded
+    with setup None and the reason in error, so it can be reported without
+    stopping the batch.
+    """
+    def checked(default_id, load, base_dir):
+        try:
+            record = load()
+        except (OSError, ValueError) as e:
+            return default_id, None, base_dir, f"{type(e).__name__}: {e}"
+        error = setup_error(record)
+        if error:
+            return default_id, None, base_dir, error
+        return record.get("site") or default_id, record, base_dir, None
+
+    def load_file(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            if name.endswith(".json") and os.path.isfile(path):
+                yield checked(os.path.splitext(name)[0], lambda: load_file(path), source)
+        return
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                yield checked(f"site-{line_no}", lambda: json.loads(line), base_dir)
+
+
+def input_fingerprint(record, base_dir):
+    """Key of the setup record plus the size and mtime of any "@file" payloads it references"""
+    files = {}
+    for field in PAYLOAD_FIELDS:
+        value = record.get(field)
+        # Inline payloads (text, JSON objects, anything build_setup will reject) are part of the record
+        if isinstance(value, str) and value.startswith("@"):
+            try:
+                stat = os.stat(os.path.join(base_dir, value[1:]))
+                files[field] = [stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                files[field] = None
+    return make_key(json.dumps(record, sort_keys=True), json.dumps(files, sort_keys=True))
+
+
+def site_slug(site_id):
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", str(site_id)).strip("-") or "site"
+
+
+def load_existing(site_dir):
+    """The site's results.json from an earlier run, if any"""
+    path = os.path.join(site_dir, RESULTS_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def write_json(path, data):
+    """Write via a temp file so an interrupted run never leaves a truncated results file"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def audit_site(site_id, setup, site_dir, fingerprint, html=True, bypass_cache=False, previous=None):
+    """Audit one site and write its results.json (and report.html).
+
+    previous is the site's earlier results.json: sections whose input is
+    unchanged are reused from it, and so is its synthesis if no section changed.
+    """
+    from synthesizer import synthesize_results
+    from export_html import export_report
+    from history import history_store
+    started = time.time()
+    with retry_budget(RETRY_BUDGET):
+        results = run_audits(setup, bypass_cache=bypass_cache, previous=previous)
+        changed = changed_sections(results, previous)
+        # A locally built plan is redone so it can be upgraded to Claude's synthesis
+        if changed or previous.get("synthesis", {}).get("source", "local") == "local":
+            synthesis = synthesize_results(results["ga4"], results["gtm"], results["datalayer"], setup,
+                                           bypass_cache=bypass_cache)
+        else:
+            synthesis = previous["synthesis"]
+
+    os.makedirs(site_dir, exist_ok=True)
+    if html:
+        export_report(results["ga4"], results["gtm"], results["datalayer"], setup,
+                      filepath=os.path.join(site_dir, REPORT_FILE))
+    output = {
+        "site": site_id,
+        "input_fingerprint": fingerprint,
+        "audited_at": datetime.now().isoformat(timespec="seconds"),
+        "duration_seconds": round(time.time() - started, 1),
+        "reaudited_sections": changed,
+        "setup": {k: setup[k] for k in SETUP_DEFAULTS},
+        "ga4": results["ga4"],
+        "gtm": results["gtm"],
+        "datalayer": results["datalayer"],
+        "synthesis": synthesis
+    }
+    # results.json is written last: its presence marks the site as done
+    write_json(os.path.join(site_dir, RESULTS_FILE), output)
+    try:
+        history_store.record_run(dict(results, setup=setup), synthesis, site=site_id)
+    except (sqlite3.Error, OSError) as e:
+        print(f"  {site_id}: audit history not saved: {e}", file=sys.stderr)
+    return output
+
+
+def index_entry(site_id, site_dir, output, status):
+    scores = {section: output[section].get("score", 0) for section in ("ga4", "gtm", "datalayer")}
+    findings = [f for section in ("ga4", "gtm", "datalayer") for f in visible_findings(output[section])]
+    return {
+        "site": site_id,
+        "status": status,
+        "overall_score": round(sum(scores.values()) / len(scores)),
+        "scores": scores,
+        "overall_health": output.get("synthesis", {}).get("overall_health"),
+        "critical": sum(1 for f in findings if f.get("severity") == "critical"),
+        "high": sum(1 for f in findings if f.get("severity") == "high"),
+        "audited_at": output.get("audited_at"),
+        "results": os.path.join(site_dir, RESULTS_FILE),
+        "report": os.path.join(site_dir, REPORT_FILE)
+    }
+
+
+def run_batch(source, out_dir, workers=BATCH_WORKERS, html=True, bypass_cache=False):
+    """Audit every site in source with at most `workers` sites in flight.
+
+    Returns the index entries (also written to <out_dir>/index.json), in
+    input order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    print_lock = threading.Lock()
+    entries = {}
+    jobs = []
+    seen = set()
+
+    load_failed = 0
+    for site_id, record, base_dir, error in load_setups(source):
+        slug = base_slug = site_slug(site_id)
+        n = 1
+        while slug in seen:
+            n += 1
+            slug = f"{base_slug}-{n}"
+        seen.add(slug)
+        if error:
+            # Not auditable; listed as failed so the rest of the batch still runs
+            entries[slug] = {"site": site_id, "status": "error", "error": error}
+            load_failed += 1
+            print(f"  ❌ {site_id}: {error}")
+            continue
+        site_dir = os.path.join(out_dir, slug)
+        fingerprint = input_fingerprint(record, base_dir)
+        existing = None if bypass_cache else load_existing(site_dir)
+        if existing is not None and existing.get("input_fingerprint") == fingerprint:
+            entries[slug] = index_entry(site_id, site_dir, existing, "skipped")
+        else:
+            # Changed inputs: unchanged sections of the earlier results are reused
+            jobs.append((slug, site_id, record, base_dir, site_dir, fingerprint, existing))
+        entries.setdefault(slug, None)
+
+    total = len(entries)
+    skipped = total - len(jobs) - load_failed
+    print(f"\n🔍 Batch audit: {total} sites, {skipped} already done, {len(jobs)} to audit "
+          f"({workers} at a time)" + (f", {load_failed} unreadable" if load_failed else "") + "\n")
+
+    def work(job):
+        slug, site_id, record, base_dir, site_dir, fingerprint, previous = job
+        setup = build_setup(record, base_dir)
+        return audit_site(site_id, setup, site_dir, fingerprint, html=html, bypass_cache=bypass_cache,
+                          previous=previous)
+
+    started = time.time()
+    done = failed = 0
+    with collect() as run_metrics:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {submit_with_context(pool, work, job): job for job in jobs}
+            for future in as_completed(futures):
+                slug, site_id, _, _, site_dir, _, _ = futures[future]
+                try:
+                    output = future.result()
+                    entries[slug] = index_entry(site_id, site_dir, output, "done")
+                    done += 1
+                    message = f"✅ {site_id}: {entries[slug]['overall_score']}/100"
+                    if len(output["reaudited_sections"]) < len(SECTION_AUDITORS):
+                        message += f" (re-audited: {', '.join(output['reaudited_sections']) or 'none'})"
+                except Exception as e:
+                    # One broken site must not stop the batch; it is retried on the next run
+                    entries[slug] = {"site": site_id, "status": "error", "error": f"{type(e).__name__}: {e}"}
+                    failed += 1
+                    message = f"❌ {site_id}: {type(e).__name__}: {e}"
+                with print_lock:
+                    print(f"  [{done + failed}/{len(jobs)}] {message}")
+
+    elapsed = time.time() - started
+    failed += load_failed
+    index = {
+        "source": os.path.abspath(source),
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "sites": total,
+        "audited": done,
+        "skipped": skipped,
+        "failed": failed,
+        "elapsed_seconds": round(elapsed, 1),
+        "sites_per_minute": round(done / elapsed * 60, 2) if done and elapsed else 0.0,
+        "metrics": run_metrics.summary(),
+        "entries": list(entries.values())
+    }
+    write_json(os.path.join(out_dir, INDEX_FILE), index)
+    write_prometheus(os.path.join(out_dir, METRICS_FILE), run_metrics)
+
+    print(f"\n📊 {done} audited, {skipped} skipped, {failed} failed in {elapsed:.1f}s "
+          f"({index['sites_per_minute']} sites/min)")
+    print(f"📂 Index: {os.path.join(out_dir, INDEX_FILE)}")
+    return index["entries"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit many sites from setup files without the interactive intake")
+    parser.add_argument("source", help="directory of <site>.json setup files, or a JSONL file with one setup per line")
+    parser.add_argument("--out", default="audits", help="output directory (default: audits/)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS,
+                        help=f"sites audited concurrently (default: {BATCH_WORKERS}, or BATCH_WORKERS)")
+    parser.add_argument("--no-html", action="store_true", help="skip the per-site HTML reports")
+    parser.add_argument("--fresh", action="store_true",
+                        help="re-audit every site and bypass the response cache")
+    args = parser.parse_args()
+
+    entries = run_batch(args.source, args.out, workers=args.workers, html=not args.no_html,
+                        bypass_cache=args.fresh)
+    if any(e["status"] == "error" for e in entries):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
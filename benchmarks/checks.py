@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Offline behaviour checks - asserts the invariants the optimisations rely on
+
+Usage:
+    python benchmarks/checks.py                   # every check
+    python benchmarks/checks.py --only sharding
+
+No API calls are made; anything that would call Claude uses the fake client
+or a stub. Each check prints ✅ or ❌ and the run exits with status 1 if any
+check fails.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import traceback
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Configure the tool before it is imported: no real key, no shared cache, memo, history or output budget
+_CACHE_DIR = tempfile.mkdtemp(prefix="audit-checks-")
+os.environ.setdefault("ANTHROPIC_API_KEY", "checks")
+os.environ["AUDIT_CACHE_PATH"] = os.path.join(_CACHE_DIR, "responses.sqlite3")
+os.environ["AUDIT_CACHE_BYPASS"] = "1"
+os.environ["AUDIT_HISTORY_PATH"] = os.path.join(_CACHE_DIR, "history.sqlite3")
+os.environ["AUDIT_BUDGET_PATH"] = os.path.join(_CACHE_DIR, "output_budget.json")
+
+from benchmarks import fixtures
+
+
+# --- Checks: each raises AssertionError on failure ---
+
+def check_sharding():
+    """shard_text never makes more than MAX_SHARDS shards and loses no input; fit_shard bounds a shard"""
+    from config import MAX_SECTION_INPUT_CHARS, MAX_SHARDS
+    from auditors.sharding import shard_text, event_family, tag_group, line_block
+    inputs = [
+        ("ga4", fixtures.ga4_event_list, event_family),
+        ("gtm", fixtures.gtm_export, tag_group),
+        ("datalayer", fixtures.datalayer_dump, line_block)
+    ]
+    for name, make_input, group_key in inputs:
+        # 400 KB of ten equal GA4 families packs into 10 shards before they are merged
+        for size in (30_000, 400_000, 1_300_000):
+            text = make_input(size)
+            shards = shard_text(text, group_key)
+            assert 1 <= len(shards) <= MAX_SHARDS, f"{name} {size}: {len(shards)} shards"
+            kept = sum(len(line) for line in text.splitlines() if line.strip())
+            assert sum(len(line) for _, shard in shards for line in shard.splitlines()) == kept, \
+                f"{name} {size}: shards don't add up to the input"
+            if len(text) <= MAX_SECTION_INPUT_CHARS * MAX_SHARDS // 2:
+                assert max(len(shard) for _, shard in shards) <= MAX_SECTION_INPUT_CHARS, \
+                    f"{name} {size}: a shard exceeds MAX_SECTION_INPUT_CHARS"
+    assert len(shard_text("x" * 100, line_block, max_chars=10, max_shards=3)) == 3
+
+    # A GTM shard the cap made oversized keeps the tag lines that fit and summarises the rest by type
+    from auditors.sharding import fit_shard
+    from auditors.gtm_container import summarise_tag_lines
+    lines = [f"- HTML - Pixel {i} | {'Custom HTML' if i % 3 else 'GA4 Event [paused]'} | All Pages"
+             for i in range(3000)]
+    fitted = fit_shard("\n".join(lines), MAX_SECTION_INPUT_CHARS, summarise_tag_lines).splitlines()
+    shown = len(fitted) - 1
+    assert len("\n".join(fitted)) <= MAX_SECTION_INPUT_CHARS and fitted[:-1] == lines[:shown]
+    html = sum(1 for i in range(shown, len(lines)) if i % 3)
+    expected = f"Custom HTML x{html}, GA4 Event x{len(lines) - shown - html}"
+    assert fitted[-1] == f"(+{len(lines) - shown} more tags not shown: {expected})", fitted[-1]
+
+
+def check_stream_fallback():
+    """A stream that breaks part-way still yields the whole reply, each finding reported once"""
+    from benchmarks.fake_client import FakeAnthropic, install
+    from llm import complete_json
+    from schemas import AUDIT_OUTPUT
+    # 1024 tokens cuts the reply off, so the non-streamed retry of the tool call has no usable input
+    for max_tokens in (1024, 8192):
+        fake = FakeAnthropic(findings_count=12, break_streams=1)
+        install(fake)
+        reported = []
+        data, _ = complete_json(f"stream fallback {max_tokens}", max_tokens=max_tokens, output=AUDIT_OUTPUT,
+                                on_finding=reported.append)
+        assert data is not None and len(data["findings"]) == 12, f"max_tokens {max_tokens}: reply lost"
+        assert [f["issue"] for f in reported] == [f["issue"] for f in data["findings"]], \
+            f"max_tokens {max_tokens}: findings reported {len(reported)} times for 12"
+
+
+def check_continuation():
+    """A continued reply keeps the whitespace at the cut point, with only the prefill copy stripped"""
+    from llm import continuation_request, splice_continuation
+    request = {"messages": [{"role": "user", "content": "audit"}], "tool_choice": {"type": "tool", "name": "x"}}
+    partial = '{"findings": [{"issue": "No purchase '
+    follow_up = continuation_request(request, partial)
+    assert follow_up["messages"][-1] == {"role": "assistant", "content": partial.rstrip()}
+    assert follow_up["tool_choice"] == {"type": "none"} and request["tool_choice"]["type"] == "tool"
+    # Claude regenerates the stripped space, or not; either way it appears once
+    for more in (' event"', 'event"'):
+        assert splice_continuation(partial, more) == '{"findings": [{"issue": "No purchase event"', more
+    assert splice_continuation('{"issue": "No', ' purchase"') == '{"issue": "No purchase"'
+
+
+def _finding(issue, fix, severity="high", category="missing_event"):
+    return {"issue": issue, "severity": severity, "category": category, "details": "", "fix": fix,
+            "business_impact": ""}
+
+
+def check_dedup():
+    """Cross-section duplicates are merged into one kept finding; unrelated findings are not"""
+    from dedup import dedupe_findings, visible_findings
+    purchase = {
+        "ga4": _finding("No purchase event is tracked", "Send the purchase event with transaction_id, value, "
+                        "currency and items on the order confirmation page", "high"),
+        "gtm": _finding("Missing GA4 purchase event tag", "Create a GA4 Event tag for purchase that sends "
+                        "transaction_id, value, currency and items, fired on the order confirmation page",
+                        "medium"),
+        "datalayer": _finding("dataLayer has no purchase push", "Push a purchase event with transaction_id, value, "
+                              "currency and items to the dataLayer on the order confirmation page", "critical")
+    }
+    # A second GA4 finding about the same gap: a cluster takes at most one finding per section
+    purchase_again = _finding("Purchase is not tracked on the order confirmation page",
+                              "Send purchase with transaction_id, value, currency and items there", "medium")
+    consent = _finding("Consent mode v2 is not configured", "Set default consent states for ad_storage and "
+                       "analytics_storage before any tag fires", "high", "consent")
+    # Only boilerplate words in common, which the stopword list ignores
+    boilerplate = _finding("Missing event tracking tag", "Add the tag and ensure the event is tracked", "low")
+    boilerplate_too = _finding("Tracking event tag missing", "Configure the tag so the event fires", "low")
+
+    def run(ga4, gtm, datalayer, **kwargs):
+        results = {"ga4": {"findings": ga4}, "gtm": {"findings": gtm}, "datalayer": {"findings": datalayer}}
+        return results, dedupe_findings(results, **kwargs)
+
+    results, marked = run([purchase["ga4"], purchase_again, boilerplate], [purchase["gtm"], consent],
+                          [purchase["datalayer"], boilerplate_too])
+    assert marked == 2, f"{marked} findings marked, expected the GA4 and GTM purchase findings"
+    keeper = purchase["datalayer"]
+    assert "duplicate_of" not in keeper, "the critical finding must be the one kept"
+    assert sorted(ref["section"] for ref in keeper["also_reported_in"]) == ["ga4", "gtm"]
+    for section in ("ga4", "gtm"):
+        assert purchase[section]["duplicate_of"]["section"] == "datalayer"
+    for finding in (purchase_again, consent, boilerplate, boilerplate_too):
+        assert not any(field in finding for field in ("duplicate_of", "also_reported_in")), finding["issue"]
+    assert [len(visible_findings(results[s])) for s in ("ga4", "gtm", "datalayer")] == [2, 1, 2]
+
+    # Re-run over reused results after GTM and the dataLayer were re-audited: old marks go
+    _, marked = run([purchase["ga4"], purchase_again], [consent], [])
+    assert marked == 0 and not any(field in purchase["ga4"] for field in ("duplicate_of", "also_reported_in"))
+
+    # Reworded findings: about 0.55 similar, merged at the default threshold only
+    currency = _finding("Purchase events are sent without currency",
+                        "Add currency next to value on every purchase event so revenue is reported")
+    currency_push = _finding("The purchase push has no currency key",
+                             "Include currency next to value in the purchase push so revenue reports work")
+    assert run([currency], [], [currency_push])[1] == 1
+    assert run([currency], [], [currency_push], threshold=0.6)[1] == 0
+    assert run([currency], [], [currency_push], threshold=0)[1] == 0
+    assert "duplicate_of" not in currency_push, "threshold 0 must clear marks too"
+
+
+def check_memo():
+    """Concurrent identical calls share one compute; errors and keep=False results are not stored"""
+    import threading
+    import time
+    from memo import Memo
+    from telemetry import registry
+    callers = 8
+
+    def run_concurrently(memo, compute, keep=None):
+        """Start one caller, hold its compute until callers - 1 more have joined it; returns their outcomes"""
+        started, release = threading.Event(), threading.Event()
+        outcomes = []
+        lock = threading.Lock()
+        coalesced = f"memo{{memo={memo.name},result=coalesced}}"
+        before = registry.summary()["counters"].get(coalesced, 0)
+
+        def held():
+            started.set()
+            assert release.wait(10), "compute was never released"
+            return compute()
+
+        def call():
+            try:
+                outcome = memo.get_or_compute("key", held, keep=keep)
+            except Exception as e:
+                outcome = (e, "error")
+            with lock:
+                outcomes.append(outcome)
+
+        threads = [threading.Thread(target=call)]
+        threads[0].start()
+        assert started.wait(10), "first caller never computed"
+        threads += [threading.Thread(target=call) for _ in range(callers - 1)]
+        for thread in threads[1:]:
+            thread.start()
+        deadline = time.monotonic() + 10
+        while registry.summary()["counters"].get(coalesced, 0) - before < callers - 1:
+            assert time.monotonic() < deadline, "callers did not join the running compute"
+            time.sleep(0.005)
+        release.set()
+        for thread in threads:
+            thread.join(10)
+        assert len(outcomes) == callers
+        return outcomes
+
+    computes = []
+
+    def compute():
+        computes.append(1)
+        return {"findings": [{"issue": "one"}]}
+
+    # One compute serves every caller; each gets its own copy; the next call is a hit
+    memo = Memo("check-shared", ttl=60)
+    outcomes = run_concurrently(memo, compute)
+    assert len(computes) == 1, f"{len(computes)} computes for {callers} callers"
+    assert sorted(status for _, status in outcomes) == ["coalesced"] * (callers - 1) + ["miss"]
+    assert all(value == {"findings": [{"issue": "one"}]} for value, _ in outcomes)
+    outcomes[0][0]["findings"].clear()
+    value, status = memo.get_or_compute("key", compute)
+    assert (status, len(computes), value["findings"]) == ("hit", 1, [{"issue": "one"}])
+
+    # An exception reaches every caller and is not stored
+    def fail():
+        computes.append(1)
+        raise ValueError("audit failed")
+
+    memo, computes[:] = Memo("check-errors", ttl=60), []
+    outcomes = run_concurrently(memo, fail)
+    assert len(computes) == 1 and all(isinstance(error, ValueError) for error, _ in outcomes)
+    assert memo.get_or_compute("key", compute)[1] == "miss" and len(memo) == 1
+
+    # keep=False: every caller gets the result, but it is not stored
+    memo, computes[:] = Memo("check-keep", ttl=60), []
+    outcomes = run_concurrently(memo, compute, keep=lambda value: False)
+    assert len(computes) == 1 and all(value["findings"] for value, _ in outcomes)
+    assert len(memo) == 0 and memo.get_or_compute("key", compute)[1] == "miss"
+
+
+CHECKS = {
+    "sharding": check_sharding,
+    "stream_fallback": check_stream_fallback,
+    "continuation": check_continuation,
+    "dedup": check_dedup,
+    "memo": check_memo
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline behaviour checks for the analytics audit tool")
+    parser.add_argument("--only", help=f"comma-separated subset of: {', '.join(CHECKS)}")
+    args = parser.parse_args()
+
+    selected = args.only.split(",") if args.only else list(CHECKS)
+    unknown = [name for name in selected if name not in CHECKS]
+    if unknown:
+        parser.error(f"unknown check(s): {', '.join(unknown)}")
+
+    failed = []
+    for name in selected:
+        try:
+            CHECKS[name]()
+            print(f"  ✅ {name}")
+        except Exception:
+            failed.append(name)
+            print(f"  ❌ {name}\n{traceback.format_exc()}")
+    print(f"\n{len(selected) - len(failed)}/{len(selected)} checks passed")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# Fake Anthropic client - replays canned audit responses with configurable latency
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+SEVERITIES = ["critical", "high", "medium", "low", "info"]
+CATEGORIES = ["missing_event", "naming", "parameters", "duplicate", "consent", "pii", "data_types"]
+
+
+def make_finding(i, section="ga4"):
+    """A finding shaped and sized like a real model response"""
+    return {
+        "issue": f"{section.upper()} issue {i}: event_{i % 97} sends incomplete parameters",
+        "severity": SEVERITIES[i % len(SEVERITIES)],
+        "category": CATEGORIES[i % len(CATEGORIES)],
+        "details": (f"The event_{i % 97} event is missing item_id and currency on {i % 13 + 1} page templates. "
+                    "Without them GA4 cannot attribute revenue to products, and the ecommerce reports show "
+                    "'(not set)' for a large share of purchases."),
+        "fix": (f"Add item_id and currency to the event_{i % 97} dataLayer push: dataLayer.push({{event: "
+                f"'event_{i % 97}', ecommerce: {{currency: 'EUR', items: [{{item_id: 'SKU{i}'}}]}}}}), then map "
+                "them in the GA4 Event tag."),
+        "business_impact": "Product and revenue reports are incomplete, so merchandising decisions rely on partial data."
+    }
+
+
+def make_section_result(findings_count, section="ga4"):
+    return {
+        "findings": [make_finding(i, section) for i in range(findings_count)],
+        "score": 55,
+        "summary": f"Benchmark {section} result with {findings_count} findings."
+    }
+
+
+SYNTHESIS = {
+    "executive_summary": "Tracking covers the basics but key funnel events and consent handling are missing.",
+    "overall_health": "needs_attention",
+    "immediate_actions": [
+        {"action": f"Fix issue {i}", "why": "Revenue attribution", "effort": "days", "impact": "Complete funnel data"}
+        for i in range(5)
+    ],
+    "30_day_plan": "Implement the missing ecommerce events and consolidate duplicate tags.",
+    "90_day_plan": "Documented measurement plan, consent mode v2 and automated QA of the dataLayer.",
+    "estimated_data_quality_improvement": "40%",
+    "risks_of_inaction": "Budget decisions continue to rely on inflated and incomplete data."
+}
+
+
+class FakeAnthropic:
+    """Stand-in for anthropic.Anthropic covering what the tool uses: messages.create / .stream.
+
+    Every request sleeps latency seconds (plus per_token_latency per output
+    token, to mimic generation time), then answers with a canned synthesis
+    for synthesis prompts or a section result with findings_count findings.
+    Requests that force a tool get a tool_use block, others a text block.
+    Replies longer than max_tokens (at 4 characters per token) are cut off
+    with stop_reason "max_tokens"; like the real API, a cut-off tool call
+    only has its partial JSON in the stream, not in a non-streamed tool_use
+    input. Continuation requests get the remainder. Streams are delivered in
+    chunk_chars pieces; the first break_streams streams fail half-way with a
+    connection error.
+    """
+
+    def __init__(self, latency=0.0, per_token_latency=0.0, findings_count=6, chunk_chars=40, break_streams=0):
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self.findings_count = findings_count
+        self.chunk_chars = chunk_chars
+        self.break_streams = break_streams
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._responses = {}
+        self.messages = _FakeMessages(self)
+
+    def response_text(self, request):
+        system = request.get("system") or ""
+        if isinstance(system, list):
+            system = " ".join(block.get("text", "") for block in system)
+        if "Strategist" in system:
+            return json.dumps(SYNTHESIS, indent=2)
+        with self._lock:
+            if self.findings_count not in self._responses:
+                self._responses[self.findings_count] = json.dumps(
+                    make_section_result(self.findings_count), indent=2)
+            return self._responses[self.findings_count]
+
+    def respond(self, request):
+        """(message, reply text); the text is what a stream of the message delivers"""
+        with self._lock:
+            self.requests += 1
+        text = self.response_text(request)
+        tool_choice = request.get("tool_choice") or {}
+        tool = tool_choice.get("name") if tool_choice.get("type") == "tool" else None
+        messages = request.get("messages", [])
+        if messages and messages[-1]["role"] == "assistant":
+            # Continuation: carry on from the prefilled partial reply
+            text = text[len(messages[-1]["content"]):]
+        stop_reason = "tool_use" if tool else "end_turn"
+        limit = request.get("max_tokens", 0) * 4
+        if limit and len(text) > limit:
+            text, stop_reason = text[:limit], "max_tokens"
+
+        output_tokens = len(text) // 4
+        delay = self.latency + self.per_token_latency * output_tokens
+        if delay:
+            time.sleep(delay)
+        prompt_chars = sum(len(m.get("content", "")) for m in messages)
+        usage = SimpleNamespace(input_tokens=prompt_chars // 4, output_tokens=output_tokens,
+                                cache_creation_input_tokens=0, cache_read_input_tokens=0)
+        if tool:
+            data = json.loads(text) if stop_reason != "max_tokens" else {}
+            block = SimpleNamespace(type="tool_use", id="toolu_fake", name=tool, input=data)
+        else:
+            block = SimpleNamespace(type="text", text=text)
+        message = SimpleNamespace(content=[block], usage=usage, model=request.get("model"), stop_reason=stop_reason)
+        return message, text
+
+
+class _FakeMessages:
+    def __init__(self, fake):
+        self._fake = fake
+
+    def create(self, **request):
+        return self._fake.respond(request)[0]
+
+    def stream(self, **request):
+        fake = self._fake
+        with fake._lock:
+            broken = fake.break_streams > 0
+            fake.break_streams -= broken
+        return _FakeStream(*fake.respond(request), fake.chunk_chars, broken)
+
+
+class _FakeStream:
+    def __init__(self, message, text, chunk_chars, broken=False):
+        self._message = message
+        self._text = text
+        self._chunk_chars = chunk_chars
+        self._broken = broken
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _chunks(self):
+        for i in range(0, len(self._text), self._chunk_chars):
+            yield self._text[i:i + self._chunk_chars]
+
+    def __iter__(self):
+        tool = self._message.content[0].type == "tool_use"
+        for i, chunk in enumerate(self._chunks()):
+            if self._broken and i * self._chunk_chars >= len(self._text) // 2:
+                import anthropic
+                raise anthropic.APIConnectionError(request=None)
+            delta = (SimpleNamespace(type="input_json_delta", partial_json=chunk) if tool
+                     else SimpleNamespace(type="text_delta", text=chunk))
+            yield SimpleNamespace(type="content_block_delta", index=0, delta=delta)
+
+    @property
+    def text_stream(self):
+        if self._message.content[0].type == "text":
+            yield from self._chunks()
+
+    def get_final_message(self):
+        return self._message
+
+    @property
+    def current_message_snapshot(self):
+        return self._message
+
+
+def install(fake):
+    """Route the tool's shared client wrapper to fake; returns the previous inner client"""
+    import config
+    previous = config.client.client
+    config.client.client = fake
+    return previous
@@ -0,0 +1,76 @@
+# Benchmark inputs - synthetic setups and pasted payloads of a given size
+import json
+
+BASE_SETUP = {
+    "industry": "E-commerce / Retail",
+    "website_type": "E-commerce store",
+    "platform": "Shopify",
+    "goals": ["Track conversions / purchases", "Understand user journey / funnel"]
+}
+
+FAMILIES = ["view", "add", "remove", "select", "begin", "purchase", "refund", "search", "login", "form"]
+
+
+def ga4_event_list(target_chars):
+    """Measurement-plan style event list ("name: param, param") of about target_chars"""
+    lines, size, i = [], 0, 0
+    while size < target_chars:
+        line = (f"{FAMILIES[i % len(FAMILIES)]}_event_{i}: item_id, item_name, price, currency, "
+                f"value, coupon, custom_param_{i % 50}")
+        lines.append(line)
+        size += len(line) + 1
+        i += 1
+    return "\n".join(lines)
+
+
+def gtm_export(target_chars):
+    """GTM container export JSON of about target_chars"""
+    tags, triggers, variables = [], [], []
+    size, i = 0, 0
+    while size < target_chars:
+        trigger_id = str(100 + i)
+        triggers.append({"triggerId": trigger_id, "name": f"CE - event_{i}", "type": "customEvent"})
+        variables.append({"name": f"DLV - param_{i}", "type": "v",
+                          "parameter": [{"type": "template", "key": "name", "value": f"param_{i}"}]})
+        tag = {
+            "tagId": str(i), "name": f"{['GA4', 'Meta', 'Ads', 'HTML'][i % 4]} - Event - event_{i}",
+            "type": ["gaawe", "html", "awct", "html"][i % 4],
+            "firingTriggerId": [trigger_id] if i % 17 else [],
+            "parameter": [
+                {"type": "template", "key": "eventName", "value": f"event_{i}"},
+                {"type": "template", "key": "html", "value": f"<script>track('{{{{DLV - param_{i}}}}}')</script>"}
+            ]
+        }
+        tags.append(tag)
+        size += len(json.dumps(tag)) + len(json.dumps(triggers[-1])) + len(json.dumps(variables[-1]))
+        i += 1
+    export = {"exportFormatVersion": 2, "containerVersion": {
+        "container": {"name": "Benchmark", "publicId": "GTM-BENCH"},
+        "containerVersionId": "42",
+        "tag": tags, "trigger": triggers, "variable": variables,
+        "builtInVariable": [{"name": "Page URL"}, {"name": "Event"}]
+    }}
+    return json.dumps(export)
+
+
+def datalayer_dump(target_chars):
+    """JSON array of dataLayer pushes of about target_chars"""
+    pushes, size, i = [], 0, 0
+    while size < target_chars:
+        push = {"event": f"{FAMILIES[i % len(FAMILIES)]}_step",
+                "ecommerce": {"currency": "EUR", "value": "49.99" if i % 7 == 0 else 49.99,
+                              "items": [{"item_id": f"SKU{i}", "item_name": "Shirt", "price": 49.99}]},
+                "user": {"loggedIn": bool(i % 2), "email": "jane@example.com" if i % 101 == 0 else None}}
+        pushes.append(push)
+        size += len(json.dumps(push)) + 2
+        i += 1
+    return json.dumps(pushes)
+
+
+def setup_with_inputs(target_chars):
+    """A full setup whose three pasted payloads are each about target_chars"""
+    setup = dict(BASE_SETUP)
+    setup["ga4_events"] = ga4_event_list(target_chars)
+    setup["gtm_tags"] = gtm_export(target_chars)
+    setup["datalayer_sample"] = datalayer_dump(target_chars)
+    return setup
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite - measures the tool's own overhead without API calls
+
+Usage:
+    python benchmarks/run.py                      # full suite, results in benchmarks/results/
+    python benchmarks/run.py --quick              # smaller sizes, fewer repeats
+    python benchmarks/run.py --only json_parse,export_report
+    python benchmarks/run.py --compare benchmarks/results/baseline.json
+
+All Claude requests are answered by benchmarks.fake_client.FakeAnthropic,
+so runs are free and repeatable. Results are written as JSON, one entry per
+(benchmark, params) with median and min seconds. The run exits with status 1
+if --compare finds a median that regressed by more than --threshold, or if
+an entry point imports slower than STARTUP_BUDGET_SECONDS or eagerly pulls in
+the SDK, Streamlit or the report/synthesis modules.
+"""
+
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Configure the tool before it is imported: no real key, no shared cache, memo, history or output budget, no rate limits
+_CACHE_DIR = tempfile.mkdtemp(prefix="audit-bench-")
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+os.environ["AUDIT_CACHE_PATH"] = os.path.join(_CACHE_DIR, "responses.sqlite3")
+os.environ["AUDIT_CACHE_BYPASS"] = "1"
+os.environ["AUDIT_MEMO_TTL"] = "0"
+os.environ["AUDIT_HISTORY_PATH"] = os.path.join(_CACHE_DIR, "history.sqlite3")
+os.environ["AUDIT_BUDGET_PATH"] = os.path.join(_CACHE_DIR, "output_budget.json")
+os.environ["ANTHROPIC_RPM"] = "0"
+os.environ["ANTHROPIC_TPM"] = "0"
+
+from benchmarks.fake_client import FakeAnthropic, SYNTHESIS, make_section_result, install
+from benchmarks import fixtures
+
+FINDING_SIZES = [5, 50, 500, 5000]
+QUICK_FINDING_SIZES = [5, 500]
+INPUT_SIZES = [10_000, 1_000_000, 5_000_000]
+QUICK_INPUT_SIZES = [10_000, 1_000_000]
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# Import time of each entry point, measured in a fresh interpreter
+STARTUP_MODULES = ["main", "batch", "runner"]
+STARTUP_BUDGET_SECONDS = 0.3
+# Modules an entry point must not import up front
+HEAVY_MODULES = ["anthropic", "streamlit", "httpx", "synthesizer", "export_html"]
+
+
+def measure(fn, repeat):
+    """Run fn repeat times; returns timing stats and the last return value"""
+    times = []
+    value = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = fn()
+        times.append(time.perf_counter() - started)
+    return {"median_seconds": statistics.median(times), "min_seconds": min(times), "runs": repeat}, value
+
+
+def split_results(findings):
+    """Spread findings over the three sections like a real run"""
+    result = make_section_result(findings)
+    third = -(-findings // 3)
+    sections = []
+    for i in range(3):
+        section = dict(result)
+        section["findings"] = result["findings"][i * third:(i + 1) * third]
+        sections.append(section)
+    return sections
+
+
+# --- Benchmarks: each yields (params, stats, extra) ---
+
+def bench_json_parse(quick):
+    from llm import parse_json_response
+    from jsonstream import iter_array_items
+    for findings in QUICK_FINDING_SIZES if quick else FINDING_SIZES:
+        text = "```json\n" + json.dumps(make_section_result(findings), indent=2) + "\n```"
+        repeat = 3 if findings >= 5000 else 20
+        stats, _ = measure(lambda: parse_json_response(text), repeat)
+        yield {"mode": "whole", "findings": findings}, stats, {"bytes": len(text)}
+        chunks = [text[i:i + 40] for i in range(0, len(text), 40)]
+        stats, count = measure(lambda: sum(1 for _ in iter_array_items(chunks, key="findings")), repeat)
+        yield {"mode": "streamed", "findings": findings}, stats, {"bytes": len(text), "items": count}
+
+
+def bench_print_report(quick):
+    from report import print_report
+    for findings in QUICK_FINDING_SIZES if quick else FINDING_SIZES:
+        ga4, gtm, dl = split_results(findings)
+        out = io.StringIO()
+
+        def run():
+            out.seek(0)
+            out.truncate()
+            with contextlib.redirect_stdout(out):
+                print_report(ga4, gtm, dl, SYNTHESIS)
+        stats, _ = measure(run, 3 if findings >= 5000 else 10)
+        yield {"findings": findings}, stats, {"output_chars": len(out.getvalue())}
+
+
+def bench_dedup(quick):
+    """Cross-section near-duplicate detection over all findings of a run"""
+    from dedup import dedupe_findings
+    for findings in QUICK_FINDING_SIZES if quick else FINDING_SIZES:
+        results = dict(zip(("ga4", "gtm", "datalayer"), split_results(findings)))
+        stats, marked = measure(lambda: dedupe_findings(results), 3 if findings >= 5000 else 10)
+        yield {"findings": findings}, stats, {"duplicates": marked}
+
+
+def bench_local_synthesis(quick):
+    """The deterministic action plan used as the instant first render and the fallback"""
+    from synthesizer import local_synthesis
+    for findings in QUICK_FINDING_SIZES if quick else FINDING_SIZES:
+        ga4, gtm, dl = split_results(findings)
+        stats, synthesis = measure(lambda: local_synthesis(ga4, gtm, dl, fixtures.BASE_SETUP), 10)
+        yield {"findings": findings}, stats, {"actions": len(synthesis["immediate_actions"])}
+
+
+def bench_export_report(quick):
+    from export_html import export_report, render_report
+    path = os.path.join(_CACHE_DIR, "report.html")
+    for findings in QUICK_FINDING_SIZES if quick else FINDING_SIZES:
+        ga4, gtm, dl = split_results(findings)
+        repeat = 3 if findings >= 5000 else 10
+        stats, _ = measure(lambda: export_report(ga4, gtm, dl, fixtures.BASE_SETUP, filepath=path), repeat)
+        yield {"findings": findings}, stats, {"html_bytes": os.path.getsize(path)}
+        stats, html = measure(lambda: render_report(ga4, gtm, dl, fixtures.BASE_SETUP), repeat)
+        yield {"findings": findings, "mode": "memory"}, stats, {"html_bytes": len(html.encode("utf-8"))}
+
+
+def bench_large_inputs(quick):
+    """All three sections audited from pasted inputs of growing size (local work only, zero latency)"""
+    from runner import run_audits
+    fake = FakeAnthropic(latency=0.0)
+    install(fake)
+    for size in QUICK_INPUT_SIZES if quick else INPUT_SIZES:
+        setup = fixtures.setup_with_inputs(size)
+        fake.requests = 0
+        stats, _ = measure(lambda: run_audits(setup, bypass_cache=True), 1 if size >= 1_000_000 else 3)
+        yield {"input_chars_per_section": size}, stats, {"api_requests": fake.requests}
+
+
+def bench_cli(quick, latency):
+    """main.py end to end: interactive (intake answers and prompts stubbed out) and --setup mode"""
+    import main
+    fake = FakeAnthropic(latency=latency)
+    install(fake)
+    setup = fixtures.setup_with_inputs(20_000)
+    original_intake, original_input = main.run_intake, builtins.input
+    main.run_intake = lambda: dict(setup)
+    builtins.input = lambda *args: "n"
+    try:
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                main.main([])
+        stats, _ = measure(run, 2 if quick else 5)
+    finally:
+        main.run_intake, builtins.input = original_intake, original_input
+    yield {"latency": latency}, stats, {"runs_per_minute": round(60 / stats["median_seconds"], 1)}
+
+    # Non-interactive: setup file with @file payloads, JSON on stdout
+    work_dir = tempfile.mkdtemp(dir=_CACHE_DIR)
+    record = dict(fixtures.BASE_SETUP)
+    for field, payload in (("ga4_events", setup["ga4_events"]), ("gtm_tags", setup["gtm_tags"]),
+                           ("datalayer_sample", setup["datalayer_sample"])):
+        with open(os.path.join(work_dir, field + ".txt"), "w", encoding="utf-8") as f:
+            f.write(payload)
+        record[field] = "@" + field + ".txt"
+    setup_path = os.path.join(work_dir, "setup.json")
+    with open(setup_path, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+
+    def run_headless():
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert main.main(["--setup", setup_path, "--quiet"]) == main.EXIT_OK
+    stats, _ = measure(run_headless, 2 if quick else 5)
+    yield {"latency": latency, "mode": "headless"}, stats, {"runs_per_minute": round(60 / stats["median_seconds"], 1)}
+
+
+def bench_batch(quick, latency):
+    """batch.run_batch over N sites, reporting sites/minute, then a re-audit with one section changed"""
+    from batch import run_batch
+    fake = FakeAnthropic(latency=latency)
+    install(fake)
+    sites = 10 if quick else 40
+    for workers in (1, 4) if quick else (1, 4, 8):
+        work_dir = tempfile.mkdtemp(dir=_CACHE_DIR)
+        source = os.path.join(work_dir, "sites.jsonl")
+        with open(source, "w", encoding="utf-8") as f:
+            for i in range(sites):
+                record = dict(fixtures.BASE_SETUP, site=f"site-{i}", ga4_events=fixtures.ga4_event_list(5_000 + i))
+                f.write(json.dumps(record) + "\n")
+
+        def run():
+            out_dir = tempfile.mkdtemp(dir=work_dir)
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_batch(source, out_dir, workers=workers)
+        stats, _ = measure(run, 1)
+        yield ({"latency": latency, "sites": sites, "workers": workers}, stats,
+               {"sites_per_minute": round(sites / stats["median_seconds"] * 60, 1)})
+
+    # Weekly re-audit: only each site's dataLayer changed, so GA4, GTM and synthesis are reused
+    work_dir = tempfile.mkdtemp(dir=_CACHE_DIR)
+    source = os.path.join(work_dir, "sites.jsonl")
+    out_dir = os.path.join(work_dir, "out")
+    records = [dict(fixtures.BASE_SETUP, site=f"site-{i}", ga4_events=fixtures.ga4_event_list(5_000 + i))
+               for i in range(sites)]
+    for week in (1, 2):
+        with open(source, "w", encoding="utf-8") as f:
+            for record in records:
+                record["datalayer_sample"] = json.dumps([{"event": "page_view", "week": week}])
+                f.write(json.dumps(record) + "\n")
+        requests_before, fake.requests = fake.requests, 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats, _ = measure(lambda: run_batch(source, out_dir, workers=4), 1)
+    yield ({"latency": latency, "sites": sites, "workers": 4, "mode": "reaudit"}, stats,
+           {"sites_per_minute": round(sites / stats["median_seconds"] * 60, 1), "api_requests": fake.requests,
+            "full_run_api_requests": requests_before})
+
+
+def bench_startup(quick):
+    """Fresh-interpreter import time of each entry point, against STARTUP_BUDGET_SECONDS"""
+    env = dict(os.environ)
+    env.pop("AUDIT_CACHE_BYPASS", None)
+    for module in STARTUP_MODULES:
+        code = (f"import sys, time, json; t = time.perf_counter(); import {module}; "
+                f"print(json.dumps([time.perf_counter() - t, "
+                f"[m for m in {HEAVY_MODULES!r} if m in sys.modules]]))")
+
+        def run():
+            out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                                 capture_output=True, text=True, check=True).stdout
+            return json.loads(out.strip().splitlines()[-1])
+        times = [run() for _ in range(3 if quick else 10)]
+        seconds = [t for t, _ in times]
+        stats = {"median_seconds": statistics.median(seconds), "min_seconds": min(seconds), "runs": len(times)}
+        yield {"module": module}, stats, {"budget_seconds": STARTUP_BUDGET_SECONDS,
+                                          "heavy_imports": times[-1][1]}
+
+
+BENCHMARKS = {
+    "startup": lambda args: bench_startup(args.quick),
+    "json_parse": lambda args: bench_json_parse(args.quick),
+    "print_report": lambda args: bench_print_report(args.quick),
+    "dedup": lambda args: bench_dedup(args.quick),
+    "local_synthesis": lambda args: bench_local_synthesis(args.quick),
+    "export_report": lambda args: bench_export_report(args.quick),
+    "large_inputs": lambda args: bench_large_inputs(args.quick),
+    "cli": lambda args: bench_cli(args.quick, args.latency),
+    "batch": lambda args: bench_batch(args.quick, args.latency)
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def result_key(entry):
+    return entry["name"] + json.dumps(entry["params"], sort_keys=True)
+
+
+def compare(results, baseline_path, threshold):
+    """Print median changes against a baseline file; returns the regressed entries"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {result_key(e): e for e in json.load(f)["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline_path} (threshold {threshold:.0%}):")
+    for entry in results:
+        before = baseline.get(result_key(entry))
+        if not before:
+            continue
+        ratio = entry["median_seconds"] / before["median_seconds"] if before["median_seconds"] else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  ⚠️ REGRESSION"
+            regressions.append(entry)
+        print(f"  {entry['name']:<14} {json.dumps(entry['params']):<50} "
+              f"{before['median_seconds']:.4f}s -> {entry['median_seconds']:.4f}s ({ratio - 1:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the analytics audit tool")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and fewer repeats")
+    parser.add_argument("--only", help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="simulated seconds per API request for the cli/batch benchmarks (default 0.05)")
+    parser.add_argument("--out", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown counted as a regression (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    results = []
+    for name in selected:
+        for params, stats, extra in BENCHMARKS[name](args):
+            entry = {"name": name, "params": params, **{k: round(v, 6) if isinstance(v, float) else v
+                                                       for k, v in stats.items()}, **extra}
+            results.append(entry)
+            print(f"  {name:<14} {json.dumps(params):<50} median {stats['median_seconds']:.4f}s "
+                  f"(min {stats['min_seconds']:.4f}s, {stats['runs']} runs)", flush=True)
+
+    output = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "latency": args.latency
+        },
+        "results": results
+    }
+    out_path = args.out or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nResults written to {out_path}")
+
+    over_budget = [e for e in results if "budget_seconds" in e
+                   and (e["median_seconds"] > e["budget_seconds"] or e.get("heavy_imports"))]
+    for entry in over_budget:
+        print(f"  ⚠️ {entry['name']} {json.dumps(entry['params'])} over budget: "
+              f"{entry['median_seconds']:.3f}s (budget {entry['budget_seconds']}s), "
+              f"eager imports: {', '.join(entry['heavy_imports']) or 'none'}")
+
+    regressions = compare(results, args.compare, args.threshold) if args.compare else []
+    if regressions or over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
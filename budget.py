@@ -0,0 +1,91 @@
+# Output budgeting - sizes each audit request's max_tokens and findings count to its input
+import json
+import math
+import os
+import threading
+from collections import namedtuple
+
+from config import BUDGET_PATH, MIN_OUTPUT_TOKENS, MAX_OUTPUT_TOKENS
+
+# Findings requested by section input size in characters: (up to size, (fewest, most))
+FINDINGS_TIERS = [(2_000, (3, 5)), (20_000, (5, 8)), (None, (6, 10))]
+CHARS_PER_TOKEN = 4
+# Starting estimates until replies have been observed (reply characters)
+DEFAULT_FINDING_CHARS = 900
+OVERHEAD_CHARS = 600
+# Safety margin on the estimate, and the weight of each new observation in the running average
+HEADROOM = 1.3
+HISTORY_WEIGHT = 0.3
+
+Budget = namedtuple("Budget", ["findings_count", "max_tokens"])
+
+
+class OutputBudget:
+    """Plans the findings count and max_tokens of each audit request.
+
+    The findings count follows the size of the input, and fewer are asked
+    for when the local rules already reported findings. max_tokens covers
+    the most findings requested at the section's observed characters per
+    finding, plus headroom, rounded up to a power of two (so the response
+    cache key stays stable as the average drifts) and clamped to
+    MIN_OUTPUT_TOKENS..MAX_OUTPUT_TOKENS. Observed sizes are a running
+    average per section, saved to a small JSON file at path between runs
+    (an unreadable or unwritable file just means starting from the defaults).
+    """
+
+    def __init__(self, path=BUDGET_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._finding_chars = None
+
+    def _averages(self):
+        # Loaded on first use; callers hold the lock
+        if self._finding_chars is None:
+            self._finding_chars = {}
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._finding_chars = {section: float(chars) for section, chars in json.load(f).items()}
+            except (OSError, ValueError, TypeError, AttributeError):
+                pass
+        return self._finding_chars
+
+    def _save(self):
+        if not self.path:
+            return
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({section: round(chars) for section, chars in self._finding_chars.items()}, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+    def finding_chars(self, section):
+        """Average reply characters per finding seen for section"""
+        with self._lock:
+            return self._averages().get(section, DEFAULT_FINDING_CHARS)
+
+    def plan(self, section, input_chars, rule_findings=0):
+        """Budget for one request auditing input_chars of section data"""
+        low, high = next(counts for limit, counts in FINDINGS_TIERS if limit is None or input_chars <= limit)
+        if rule_findings:
+            low, high = max(3, low - 2), max(5, high - 3)
+        tokens = (OVERHEAD_CHARS + high * self.finding_chars(section)) * HEADROOM / CHARS_PER_TOKEN
+        max_tokens = 2 ** math.ceil(math.log2(tokens))
+        return Budget(f"{low}-{high}", max(MIN_OUTPUT_TOKENS, min(MAX_OUTPUT_TOKENS, max_tokens)))
+
+    def observe(self, section, data, response_text):
+        """Fold a fresh (not cached) parsed reply's size per finding into the section's average"""
+        findings = len(data.get("findings", []))
+        if not findings:
+            return
+        size = max(0, len(response_text) - OVERHEAD_CHARS) / findings
+        with self._lock:
+            averages = self._averages()
+            current = averages.get(section, DEFAULT_FINDING_CHARS)
+            averages[section] = current + HISTORY_WEIGHT * (size - current)
+            self._save()
+
+
+output_budget = OutputBudget()
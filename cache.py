@@ -0,0 +1,193 @@
+# Response cache - content-addressed LLM responses with an in-memory LRU tier
+# in front of an on-disk SQLite tier
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config import (CACHE_PATH, CACHE_MEMORY_ENTRIES, CACHE_DISK_MAX_ENTRIES,
+                    CACHE_DISK_MAX_BYTES, CACHE_TTL_SECONDS)
+
+
+def make_key(*parts):
+    """Hash the request parts (model, max_tokens, prompt...) into a cache key"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier cache: a bounded in-memory LRU backed by a size-capped SQLite file.
+
+    Entries expire after ttl seconds in both tiers. The disk tier evicts the
+    least recently used rows once it exceeds max_entries or max_bytes. If the
+    database can't be opened or written, the cache quietly falls back to the
+    memory tier only.
+    """
+
+    def __init__(self, path=CACHE_PATH, memory_entries=CACHE_MEMORY_ENTRIES,
+                 disk_max_entries=CACHE_DISK_MAX_ENTRIES, disk_max_bytes=CACHE_DISK_MAX_BYTES,
+                 ttl=CACHE_TTL_SECONDS):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_max_entries = disk_max_entries
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_failed = not path
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    # --- Public API ---
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            row = self._disk_get(key, now)
+            if row is not None:
+                value, created_at = row
+                self._memory_set(key, value, created_at)
+                self.stats["disk_hits"] += 1
+                return value
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        """Store value under key in both tiers"""
+        now = time.time()
+        with self._lock:
+            self._memory_set(key, value, now)
+            self._disk_set(key, value, now)
+            self.stats["writes"] += 1
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            db = self._connect()
+            if db is not None:
+                try:
+                    with db:
+                        db.execute("DELETE FROM responses")
+                except sqlite3.Error:
+                    self._disable_disk()
+
+    def get_stats(self):
+        """Return a copy of the hit/miss counters plus the current tier sizes (shown in the diagnostics)"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+            hits = stats["memory_hits"] + stats["disk_hits"]
+            lookups = hits + stats["misses"]
+            stats["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+            return stats
+
+    # --- Memory tier ---
+
+    def _memory_set(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # --- Disk tier ---
+
+    def _connect(self):
+        if self._db is not None or self._db_failed:
+            return self._db
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            with db:
+                db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+                db.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+            self._db = db
+        except (sqlite3.Error, OSError):
+            self._db_failed = True
+        return self._db
+
+    def _disable_disk(self):
+        self._db_failed = True
+        if self._db is not None:
+            try:
+                self._db.close()
+            except sqlite3.Error:
+                pass
+        self._db = None
+
+    def _disk_get(self, key, now):
+        db = self._connect()
+        if db is None:
+            return None
+        try:
+            row = db.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            with db:
+                if now - row[1] > self.ttl:
+                    db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    return None
+                db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return row
+        except sqlite3.Error:
+            self._disable_disk()
+            return None
+
+    def _disk_set(self, key, value, now):
+        db = self._connect()
+        if db is None:
+            return
+        try:
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value.encode("utf-8")), now, now)
+                )
+                self._disk_evict(db, now)
+        except sqlite3.Error:
+            self._disable_disk()
+
+    def _disk_evict(self, db, now):
+        # Expired rows first, then least recently used rows beyond the caps
+        expired = db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)).rowcount
+        count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        evicted = 0
+        if count > self.disk_max_entries or total > self.disk_max_bytes:
+            keep_entries, keep_bytes = 0, 0
+            doomed = []
+            for key, size in db.execute("SELECT key, size FROM responses ORDER BY accessed_at DESC"):
+                if keep_entries < self.disk_max_entries and keep_bytes + size <= self.disk_max_bytes:
+                    keep_entries += 1
+                    keep_bytes += size
+                else:
+                    doomed.append((key,))
+            db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            evicted = len(doomed)
+        self.stats["evictions"] += max(expired, 0) + evicted
+
+
+# Process-wide cache shared by every auditor and the synthesizer
+response_cache = ResponseCache()
@@ -1,24 +1,117 @@
 # Analytics Audit Tool - Configuration
 import os
-import anthropic
-
-# Try Streamlit secrets first (for cloud deployment), fall back to env var
-try:
-    import streamlit as st
-    api_key = st.secrets.get("ANTHROPIC_API_KEY", None)
-except Exception:
-    api_key = None
-
-if not api_key:
-    api_key = os.environ.get("ANTHROPIC_API_KEY")
-
-# Claude client
-client = anthropic.Anthropic(api_key=api_key)
+import sys
+from ratelimit import RateLimitedClient
 
 # Model settings
 MODEL = "claude-sonnet-4-20250514"
 MAX_TOKENS = 4096
 
+# Section audits size max_tokens to their input and past replies (see budget.py), within these bounds
+MIN_OUTPUT_TOKENS = 1024
+MAX_OUTPUT_TOKENS = int(os.environ.get("AUDIT_MAX_OUTPUT_TOKENS", 8192))
+
+# Replies cut off at max_tokens are resumed with up to this many follow-up requests
+MAX_CONTINUATIONS = int(os.environ.get("AUDIT_MAX_CONTINUATIONS", 2))
+
+# API rate limits, shared by every request in the process. Defaults match
+# Anthropic's tier-1 limits for Sonnet; raise them to your organisation's tier.
+RATE_LIMIT_RPM = int(os.environ.get("ANTHROPIC_RPM", 50))
+RATE_LIMIT_TPM = int(os.environ.get("ANTHROPIC_TPM", 30000))
+
+# Retries for 429 / 529 / transient errors: per request, and in total per audit run
+MAX_RETRIES = int(os.environ.get("ANTHROPIC_MAX_RETRIES", 6))
+RETRY_BUDGET = int(os.environ.get("AUDIT_RETRY_BUDGET", 20))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+def get_api_key():
+    """Streamlit secrets first when running in the Streamlit app (cloud deployment), else the env var"""
+    if "streamlit" in sys.modules:
+        try:
+            import streamlit as st
+            api_key = st.secrets.get("ANTHROPIC_API_KEY", None)
+            if api_key:
+                return api_key
+        except Exception:
+            pass
+    return os.environ.get("ANTHROPIC_API_KEY")
+
+
+def make_client():
+    """Build the SDK client; the anthropic import alone takes about a second, so it happens here"""
+    import anthropic
+    return anthropic.Anthropic(api_key=get_api_key(), max_retries=0)
+
+
+# Claude client - all auditors and the synthesizer go through this wrapper, which
+# does the rate limiting and retrying (the SDK's own retries are switched off).
+# The SDK client is only built when the first request is sent.
+client = RateLimitedClient(
+    factory=make_client,
+    requests_per_minute=RATE_LIMIT_RPM,
+    tokens_per_minute=RATE_LIMIT_TPM,
+    max_retries=MAX_RETRIES,
+    backoff_base=BACKOFF_BASE_SECONDS,
+    backoff_max=BACKOFF_MAX_SECONDS
+)
+
+# Section audits run concurrently; set AUDIT_WORKERS=1 to run them one at a time
+AUDIT_WORKERS = int(os.environ.get("AUDIT_WORKERS", 3))
+
+# batch.py audits this many sites at once (each site also runs its sections in parallel)
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", 4))
+
+# Section inputs larger than this (in characters) are split into shards, audited
+# concurrently and merged
+MAX_SECTION_INPUT_CHARS = 60000
+MAX_SHARDS = 8
+SHARD_WORKERS = 4
+
+# Set to write a Prometheus textfile of the run's stage timings and token counters
+METRICS_PROM_PATH = os.environ.get("AUDIT_METRICS_PROM")
+
+# Response cache - identical (model, max_tokens, prompt) requests are served locally
+CACHE_PATH = os.environ.get(
+    "AUDIT_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".audit_cache", "responses.sqlite3")
+)
+CACHE_MEMORY_ENTRIES = 256
+CACHE_DISK_MAX_ENTRIES = 5000
+CACHE_DISK_MAX_BYTES = 200 * 1024 * 1024
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+CACHE_BYPASS = os.environ.get("AUDIT_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+# Average reply size per finding for each section (see budget.py), kept apart from the
+# response cache so it survives cache clears and expiry
+BUDGET_PATH = os.environ.get(
+    "AUDIT_BUDGET_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".audit_cache", "output_budget.json")
+)
+
+# Finished section audits and syntheses are shared in-process (across Streamlit
+# sessions) for this long, and identical concurrent audits make one set of calls
+MEMO_MAX_ENTRIES = 128
+MEMO_TTL_SECONDS = int(os.environ.get("AUDIT_MEMO_TTL", 3600))
+
+# Strategic synthesis: "llm" asks Claude (with the local plan as fallback), "local" builds
+# the plan from the findings alone without an API call
+SYNTHESIS_MODE = os.environ.get("AUDIT_SYNTHESIS", "llm").lower()
+
+# Findings of different sections whose issue + fix wording is at least this similar
+# (Jaccard over content words) are merged into one; 0 turns deduplication off
+DEDUP_THRESHOLD = float(os.environ.get("AUDIT_DEDUP_THRESHOLD", 0.45))
+
+# Audit history - every completed run with its section scores and findings, queryable
+# by site (see history.py); per-run JSON files in HISTORY_LEGACY_DIR are imported once
+HISTORY_LEGACY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audit_history")
+HISTORY_PATH = os.environ.get("AUDIT_HISTORY_PATH", os.path.join(HISTORY_LEGACY_DIR, "history.sqlite3"))
+
+# Anthropic prompt caching - the static system prefix of each prompt is marked
+# cacheable so repeat audits only pay full price for the per-audit suffix
+PROMPT_CACHING = os.environ.get("AUDIT_PROMPT_CACHING", "1").lower() not in ("0", "false", "no")
+
 # Audit categories
 AUDIT_CATEGORIES = ["ga4_events", "gtm_health", "datalayer_quality"]
 
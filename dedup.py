@@ -0,0 +1,156 @@
+# Cross-section dedup - clusters findings that several auditors report for the same problem
+import hashlib
+import re
+from itertools import combinations
+
+from config import DEDUP_THRESHOLD
+from telemetry import incr
+
+SECTION_ORDER = ("ga4", "gtm", "datalayer")
+SECTION_LABELS = {"ga4": "GA4", "gtm": "GTM", "datalayer": "DataLayer"}
+SEVERITY_RANK = {"critical": 0, "high": 1, "medium": 2, "low": 3, "info": 4}
+DEDUP_FIELDS = ("duplicate_of", "also_reported_in")
+
+# MinHash signature length (one-permutation hashing into this many bins) and LSH band
+# width; 16 bands of 2 make pairs at the threshold near-certain candidates, which are then
+# checked exactly. A band shared by more than MAX_BUCKET findings is template boilerplate
+NUM_HASHES = 32
+BAND_ROWS = 2
+MAX_BUCKET = 50
+
+_TOKEN = re.compile(r"[a-z0-9_]+")
+# Words every tracking finding uses; they say nothing about which problem it is
+STOPWORDS = frozenset("""
+a an the and or of to in on for with by as at from is are be been was were it its this that these those
+not no never all any each every into via when which than then so if per your their our should must
+can could will would may might has have had do does did using use used
+ga4 gtm google analytics tag tags tagging tracking tracked track event events datalayer data layer
+push pushed trigger triggers triggered variable variables container property implement implemented
+add added create ensure configure configured set missing fix issue
+""".split())
+
+
+def _stem(token):
+    if len(token) > 5 and token.endswith("ing"):
+        return token[:-3]
+    if len(token) > 4 and token.endswith("ed"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def shingles(finding):
+    """Normalised content words of a finding's issue and fix text"""
+    text = f"{finding.get('issue') or ''} {finding.get('fix') or ''}".lower()
+    return {_stem(token) for token in _TOKEN.findall(text) if token not in STOPWORDS and len(token) > 1}
+
+
+def _token_hash(token):
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(tokens):
+    """MinHash signature of a token set: one hash per token, binned (one-permutation hashing).
+
+    Empty bins borrow the next filled bin to the right, tagged with the
+    distance, so short texts still get a full signature. None if tokens is empty.
+    """
+    bins = [None] * NUM_HASHES
+    for token in tokens:
+        h = _token_hash(token)
+        slot, value = h % NUM_HASHES, h // NUM_HASHES
+        if bins[slot] is None or value < bins[slot]:
+            bins[slot] = value
+    if not tokens:
+        return None
+    signature = list(bins)
+    for slot in range(NUM_HASHES):
+        distance = 1
+        while signature[slot] is None:
+            borrowed = bins[(slot + distance) % NUM_HASHES]
+            if borrowed is not None:
+                signature[slot] = (distance, borrowed)
+            distance += 1
+    return signature
+
+
+def _candidate_pairs(signatures):
+    """Pairs of findings from different sections that share at least one LSH band"""
+    buckets = {}
+    for index, signature in signatures.items():
+        for start in range(0, NUM_HASHES, BAND_ROWS):
+            buckets.setdefault((start, tuple(signature[start:start + BAND_ROWS])), []).append(index)
+    pairs = set()
+    for members in buckets.values():
+        if 1 < len(members) <= MAX_BUCKET:
+            pairs.update((a, b) for a, b in combinations(members, 2) if a[0] != b[0])
+    return pairs
+
+
+def _reference(section, finding):
+    return {"section": section, "issue": finding.get("issue", "")}
+
+
+def dedupe_findings(results, threshold=DEDUP_THRESHOLD):
+    """Mark findings that another section already reports; returns how many were marked.
+
+    Findings are compared by the Jaccard similarity of their issue and fix
+    words (MinHash + LSH picks the candidate pairs, which are then checked
+    exactly). Clusters hold at most one finding per section and are merged
+    most-similar first. In each cluster the finding with the highest
+    severity is kept and gets "also_reported_in" references; the others get
+    "duplicate_of" and are left out by visible_findings(). Findings are
+    marked in place, never removed, so each section's results stay complete
+    for reuse. A threshold of 0 turns deduplication off.
+    """
+    findings = {}
+    for section in SECTION_ORDER:
+        for position, finding in enumerate((results.get(section) or {}).get("findings", [])):
+            if isinstance(finding, dict):
+                for field in DEDUP_FIELDS:
+                    finding.pop(field, None)
+                findings[(section, position)] = finding
+    if not threshold:
+        return 0
+
+    tokens = {index: shingles(finding) for index, finding in findings.items()}
+    signatures = {index: minhash(words) for index, words in tokens.items() if words}
+    scored = []
+    for a, b in _candidate_pairs(signatures):
+        similarity = len(tokens[a] & tokens[b]) / len(tokens[a] | tokens[b])
+        if similarity >= threshold:
+            scored.append((-similarity, min(a, b), max(a, b)))
+
+    cluster_of = {index: [index] for index in findings}
+    for _, a, b in sorted(scored):
+        first, second = cluster_of[a], cluster_of[b]
+        if first is second or {i[0] for i in first} & {i[0] for i in second}:
+            continue
+        first.extend(second)
+        for index in second:
+            cluster_of[index] = first
+
+    marked = 0
+    for cluster in {id(c): c for c in cluster_of.values() if len(c) > 1}.values():
+        cluster.sort(key=lambda i: (SEVERITY_RANK.get(findings[i].get("severity"), 5), SECTION_ORDER.index(i[0]), i[1]))
+        keeper_index, duplicates = cluster[0], cluster[1:]
+        keeper = findings[keeper_index]
+        keeper["also_reported_in"] = [_reference(index[0], findings[index]) for index in duplicates]
+        for index in duplicates:
+            findings[index]["duplicate_of"] = _reference(keeper_index[0], keeper)
+        marked += len(duplicates)
+    if marked:
+        incr("duplicate_findings", marked)
+    return marked
+
+
+def visible_findings(results):
+    """A section's findings without those marked as duplicates of another section's"""
+    return [f for f in results.get("findings", []) if "duplicate_of" not in f]
+
+
+def also_reported_in(finding):
+    """Labels of the other sections that reported a kept finding, e.g. "GTM, DataLayer"; "" if none"""
+    return ", ".join(SECTION_LABELS.get(ref.get("section"), ref.get("section", ""))
+                     for ref in finding.get("also_reported_in") or [])
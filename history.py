@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Audit history - indexed SQLite store of past runs, section scores and findings
+
+Usage:
+    python history.py latest                    # latest run per site
+    python history.py trend SITE_KEY            # score trend, oldest first
+    python history.py resolved SITE_KEY         # findings fixed since the previous run
+    python history.py import audit_history/     # import legacy per-run JSON files
+
+Runs are grouped by site_key: the site name when one is given (batch audits),
+otherwise a fingerprint of the setup answers (industry, website type,
+platform, goals).
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cache import make_key
+from config import HISTORY_PATH, HISTORY_LEGACY_DIR
+
+SECTIONS = ("ga4", "gtm", "datalayer")
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY,
+        site_key TEXT NOT NULL,
+        site TEXT,
+        fingerprint TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        created_ts REAL NOT NULL,
+        industry TEXT,
+        website_type TEXT,
+        platform TEXT,
+        goals TEXT,
+        overall_score INTEGER,
+        overall_health TEXT,
+        total_findings INTEGER,
+        synthesis TEXT,
+        source TEXT UNIQUE
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_runs_site ON runs (site_key, created_ts)",
+    "CREATE INDEX IF NOT EXISTS idx_runs_fingerprint ON runs (fingerprint, created_ts)",
+    "CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created_ts)",
+    """CREATE TABLE IF NOT EXISTS section_scores (
+        run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+        section TEXT NOT NULL,
+        score INTEGER,
+        summary TEXT,
+        PRIMARY KEY (run_id, section)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS findings (
+        id INTEGER PRIMARY KEY,
+        run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+        section TEXT NOT NULL,
+        severity TEXT,
+        category TEXT,
+        issue TEXT,
+        issue_key TEXT NOT NULL,
+        details TEXT,
+        fix TEXT,
+        business_impact TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_findings_run ON findings (run_id, issue_key)",
+    "CREATE INDEX IF NOT EXISTS idx_findings_severity ON findings (severity, run_id)"
+]
+
+_WORD = re.compile(r"[a-z0-9_]+")
+
+
+def setup_fingerprint(setup):
+    """Identity of a setup by its intake answers (payloads excluded)"""
+    answers = [str(setup.get(field) or "").strip() for field in ("industry", "website_type", "platform")]
+    goals = sorted(g.strip() for g in setup.get("goals") or [] if g.strip())
+    return make_key("setup", answers, goals)
+
+
+def issue_key(section, finding):
+    """Matches the same finding across runs despite case and punctuation changes"""
+    return section + ":" + " ".join(_WORD.findall(str(finding.get("issue", "")).lower()))
+
+
+def _score(results):
+    try:
+        return round(float(results.get("score", 0)))
+    except (TypeError, ValueError):
+        return 0
+
+
+class HistoryStore:
+    """Audit runs in SQLite: one row per run, plus its section scores and findings.
+
+    Writes raise sqlite3.Error / OSError to the caller; a failed save is
+    reported rather than silently lost. A store created next to the legacy
+    audit_history/*.json files imports them the first time it is opened.
+    """
+
+    def __init__(self, path=HISTORY_PATH, legacy_dir=HISTORY_LEGACY_DIR):
+        self.path = path
+        self.legacy_dir = legacy_dir
+        self._db = None
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        if self._db is not None:
+            return self._db
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        is_new = not os.path.exists(self.path)
+        db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA foreign_keys=ON")
+        with db:
+            for statement in SCHEMA:
+                db.execute(statement)
+        self._db = db
+        if is_new and self.legacy_dir and os.path.isdir(self.legacy_dir):
+            self.import_json_files(self.legacy_dir)
+        return db
+
+    # --- Writes ---
+
+    def record_run(self, results, synthesis=None, site=None, created_at=None, source=None):
+        """Store one audit run; returns its id (None if source was already imported).
+
+        results holds the "ga4", "gtm" and "datalayer" section results and
+        the "setup". created_at is a datetime (default: now); source marks
+        imported runs so importing twice is a no-op.
+        """
+        setup = results.get("setup") or {}
+        created_at = created_at or datetime.now()
+        fingerprint = setup_fingerprint(setup)
+        scores = {section: _score(results.get(section) or {}) for section in SECTIONS}
+        findings = [(section, f) for section in SECTIONS
+                    for f in (results.get(section) or {}).get("findings", []) if isinstance(f, dict)]
+        synthesis = synthesis or {}
+
+        with self._lock:
+            db = self._connect()
+            with db:
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO runs (site_key, site, fingerprint, created_at, created_ts, industry, "
+                    "website_type, platform, goals, overall_score, overall_health, total_findings, synthesis, source) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (site or fingerprint, site, fingerprint, created_at.isoformat(timespec="seconds"),
+                     created_at.timestamp(), setup.get("industry"), setup.get("website_type"),
+                     setup.get("platform"), json.dumps(setup.get("goals") or []),
+                     round(sum(scores.values()) / len(scores)), synthesis.get("overall_health"),
+                     len(findings), json.dumps(synthesis, ensure_ascii=False), source)
+                )
+                if not cursor.rowcount:
+                    return None
+                run_id = cursor.lastrowid
+                db.executemany(
+                    "INSERT INTO section_scores (run_id, section, score, summary) VALUES (?, ?, ?, ?)",
+                    [(run_id, section, scores[section], (results.get(section) or {}).get("summary"))
+                     for section in SECTIONS]
+                )
+                db.executemany(
+                    "INSERT INTO findings (run_id, section, severity, category, issue, issue_key, details, fix, "
+                    "business_impact) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(run_id, section, f.get("severity"), f.get("category"), f.get("issue"), issue_key(section, f),
+                      f.get("details"), f.get("fix"), f.get("business_impact")) for section, f in findings]
+                )
+        return run_id
+
+    def import_json_files(self, directory):
+        """Import the legacy one-file-per-run history; returns how many runs were added"""
+        imported = 0
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                created_at = datetime.fromisoformat(entry["timestamp"])
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+            results = dict(entry.get("full_results") or {}, setup=entry.get("setup") or {})
+            if self.record_run(results, entry.get("synthesis"), created_at=created_at,
+                               source="json:" + os.path.abspath(path)) is not None:
+                imported += 1
+        return imported
+
+    # --- Queries ---
+
+    def _rows(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._connect().execute(sql, params)]
+
+    def _attach_scores(self, runs):
+        if runs:
+            ids = [run["id"] for run in runs]
+            scores = self._rows(
+                f"SELECT run_id, section, score FROM section_scores WHERE run_id IN ({','.join('?' * len(ids))})", ids
+            )
+            by_run = {}
+            for row in scores:
+                by_run.setdefault(row["run_id"], {})[row["section"]] = row["score"]
+            for run in runs:
+                run["scores"] = by_run.get(run["id"], {})
+        return runs
+
+    def latest_runs(self, limit=100):
+        """The most recent run of each site, newest first"""
+        return self._attach_scores(self._rows(
+            "SELECT r.id, r.site_key, r.site, r.created_at, r.industry, r.website_type, r.platform, "
+            "r.overall_score, r.overall_health, r.total_findings "
+            "FROM (SELECT id, MAX(created_ts) FROM runs GROUP BY site_key) latest "
+            "JOIN runs r ON r.id = latest.id ORDER BY r.created_ts DESC LIMIT ?",
+            (limit,)
+        ))
+
+    def score_trend(self, site_key, limit=50):
+        """Overall and per-section scores of a site's last `limit` runs, oldest first"""
+        runs = self._rows(
+            "SELECT id, created_at, overall_score, overall_health, total_findings FROM runs "
+            "WHERE site_key = ? ORDER BY created_ts DESC LIMIT ?",
+            (site_key, limit)
+        )
+        return self._attach_scores(runs[::-1])
+
+    def resolved_findings(self, site_key):
+        """Findings of a site's previous run that its latest run no longer reports"""
+        runs = self._rows("SELECT id FROM runs WHERE site_key = ? ORDER BY created_ts DESC LIMIT 2", (site_key,))
+        if len(runs) < 2:
+            return []
+        latest, previous = runs[0]["id"], runs[1]["id"]
+        return self._rows(
+            "SELECT f.section, f.severity, f.category, f.issue, f.fix FROM findings f "
+            "WHERE f.run_id = ? AND NOT EXISTS "
+            "(SELECT 1 FROM findings g WHERE g.run_id = ? AND g.issue_key = f.issue_key) "
+            "ORDER BY CASE f.severity WHEN 'critical' THEN 0 WHEN 'high' THEN 1 WHEN 'medium' THEN 2 "
+            "WHEN 'low' THEN 3 ELSE 4 END",
+            (previous, latest)
+        )
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# Process-wide store used by the app and batch audits
+history_store = HistoryStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the audit history")
+    commands = parser.add_subparsers(dest="command", required=True)
+    latest = commands.add_parser("latest", help="latest run per site")
+    latest.add_argument("--limit", type=int, default=100)
+    trend = commands.add_parser("trend", help="score trend of one site")
+    trend.add_argument("site_key")
+    trend.add_argument("--limit", type=int, default=50)
+    resolved = commands.add_parser("resolved", help="findings resolved since the previous run")
+    resolved.add_argument("site_key")
+    importer = commands.add_parser("import", help="import legacy audit_history/*.json files")
+    importer.add_argument("directory")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "latest":
+        output = history_store.latest_runs(args.limit)
+    elif args.command == "trend":
+        output = history_store.score_trend(args.site_key, args.limit)
+    elif args.command == "resolved":
+        output = history_store.resolved_findings(args.site_key)
+    else:
+        output = {"imported": history_store.import_json_files(args.directory)}
+    print(json.dumps(output, indent=2, ensure_ascii=False))
+    print(f"({time.perf_counter() - started:.3f}s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,13 @@
 # Intake module - gathers information about the user's setup
+import json
+import mmap
+import os
+import sys
+from auditors.datalayer_stream import DumpFile
+
+SETUP_DEFAULTS = {"industry": "Other", "website_type": "Other", "platform": "Other", "goals": []}
+PAYLOAD_FIELDS = ("ga4_events", "gtm_tags", "datalayer_sample")
+
 
 def run_intake():
     """Guided intake interview to understand the user's tracking setup"""
@@ -94,8 +103,9 @@ def run_intake():
     
     # DataLayer
     print("\n7. Paste a sample of your dataLayer")
-    print("   (copy from browser console: JSON.stringify(dataLayer, null, 2)):")
-    setup["datalayer_sample"] = _multiline_input()
+    print("   (copy from browser console: JSON.stringify(dataLayer, null, 2)),")
+    print("   or type @path/to/dump.json to stream a large dump from a file:")
+    setup["datalayer_sample"] = read_payload(_multiline_input(allow_file=True), "datalayer_sample")
     
     # Summary
     print("\n" + "=" * 50)
@@ -111,16 +121,80 @@ def run_intake():
     return setup
 
 
-def _multiline_input():
-    """Collect multiline input until empty line or 'skip'"""
+def _multiline_input(allow_file=False):
+    """Collect multiline input until empty line or 'skip'.
+    With allow_file, a first line of '@path' is returned as a file reference."""
     lines = []
     while True:
         line = input()
         if line.lower().strip() == 'skip':
             return ""
+        if allow_file and not lines and line.strip().startswith("@"):
+            return line.strip()
         if line == "" and lines:
             break
         if line == "" and not lines:
             continue
         lines.append(line)
-    return "\n".join(lines)
\ No newline at end of file
+    return "\n".join(lines)
+
+
+# --- Non-interactive setups (setup files, CLI flags, batch records) ---
+
+def read_text_file(path):
+    """Read a UTF-8 file in one pass, decoding straight from a memory map"""
+    with open(path, "rb") as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return str(mapped, "utf-8", errors="replace")
+        except (ValueError, OSError):
+            # Empty files and pipes can't be mapped
+            return f.read().decode("utf-8", errors="replace")
+
+
+def read_payload(value, field, base_dir="."):
+    """Resolve a payload given inline, as "@path" (relative to base_dir) or "-" (stdin).
+
+    A JSON object or array (e.g. a GTM container export embedded in a setup
+    file) is serialised back to text; any other non-string raises ValueError.
+
+    The dataLayer auditor streams files and stdin itself, so for
+    datalayer_sample a DumpFile is returned (with the path made absolute).
+    Only trusted local input may come through here: the web app passes
+    pasted text straight to the auditors.
+    """
+    if not value:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if not isinstance(value, str):
+        raise ValueError(f"{field}: expected text, a JSON object or array, \"@path\" or \"-\"")
+    if value == "-":
+        if field == "datalayer_sample":
+            return DumpFile("-")
+        return sys.stdin.buffer.read().decode("utf-8", errors="replace")
+    if value.startswith("@"):
+        path = os.path.join(base_dir, os.path.expanduser(value[1:]))
+        if field == "datalayer_sample":
+            return DumpFile(os.path.abspath(path))
+        return read_text_file(path)
+    return value
+
+
+def build_setup(record, base_dir="."):
+    """Fill in intake defaults and resolve "@file" / "-" payloads relative to base_dir.
+
+    Raises ValueError naming the field when an answer has the wrong type.
+    """
+    setup = dict(SETUP_DEFAULTS)
+    setup.update({k: v for k, v in record.items() if k != "site"})
+    for field in ("industry", "website_type", "platform"):
+        if not isinstance(setup[field], str):
+            raise ValueError(f"{field}: expected text, got {type(setup[field]).__name__}")
+    if isinstance(setup["goals"], str):
+        setup["goals"] = [g.strip() for g in setup["goals"].split(",") if g.strip()]
+    if not isinstance(setup["goals"], list) or not all(isinstance(g, str) for g in setup["goals"]):
+        raise ValueError("goals: expected a list of goals or a comma-separated string")
+    for field in PAYLOAD_FIELDS:
+        setup[field] = read_payload(setup.get(field) or "", field, base_dir)
+    return setup
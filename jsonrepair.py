@@ -0,0 +1,128 @@
+# Tolerant JSON recovery - salvages model replies that json.loads rejects
+import json
+import re
+
+_FENCE = re.compile(r"```[A-Za-z]*[ \t]*\r?\n(.*?)```", re.S)
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+# How many cut points to try when closing a truncated reply
+MAX_TRUNCATION_CUTS = 200
+
+
+def repair_json(text):
+    """Rewrite the first JSON object/array in text into something json.loads accepts.
+
+    Skips prose before the root value and ignores anything after it closes.
+    Inside the value it drops trailing commas and // comments, turns Python
+    literals (True/False/None) into JSON ones and escapes raw newlines and
+    tabs inside strings. If the text ends before the root closes (a truncated
+    reply), the last complete element is kept and the open brackets are
+    closed. Returns the repaired text, or None if there is no JSON value or
+    it can't be salvaged.
+    """
+    start = text.find("{")
+    if start < 0:
+        start = text.find("[")
+    if start < 0:
+        return None
+
+    out = []
+    stack = []
+    # (length of out, open brackets) after each complete element, for truncation
+    cuts = []
+    in_string = escape = False
+    i, n = start, len(text)
+    while i < n:
+        c = text[i]
+        if in_string:
+            if escape:
+                escape = False
+                out.append(c)
+            elif c == "\\":
+                escape = True
+                out.append(c)
+            elif c == '"':
+                in_string = False
+                out.append(c)
+            elif c == "\n":
+                out.append("\\n")
+            elif c == "\t":
+                out.append("\\t")
+            elif c != "\r":
+                out.append(c)
+            i += 1
+            continue
+
+        if c == '"':
+            in_string = True
+            out.append(c)
+        elif c in "{[":
+            stack.append("}" if c == "{" else "]")
+            out.append(c)
+        elif c in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                out.append(stack.pop())
+            if not stack:
+                return "".join(out)
+            cuts.append((len(out), tuple(stack)))
+        elif c == ",":
+            cuts.append((len(out), tuple(stack)))
+            out.append(c)
+        elif c == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end < 0 else end
+            continue
+        elif c in "TFN" and not (out and (out[-1].isalnum() or out[-1] == "_")):
+            for literal, replacement in _LITERALS.items():
+                if text.startswith(literal, i):
+                    out.append(replacement)
+                    i += len(literal)
+                    break
+            else:
+                out.append(c)
+                i += 1
+            continue
+        else:
+            out.append(c)
+        i += 1
+
+    # Truncated: close what is open, backing off to earlier complete elements if needed
+    tail = '"' if in_string else ""
+    attempts = [(len(out), tuple(stack), tail)] + [(pos, open_, "") for pos, open_ in reversed(cuts[-MAX_TRUNCATION_CUTS:])]
+    for pos, open_, tail in attempts:
+        body = out[:pos] + list(tail)
+        _drop_trailing_comma(body)
+        candidate = "".join(body) + "".join(reversed(open_))
+        try:
+            json.loads(candidate)
+            return candidate
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def _drop_trailing_comma(out):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def extract_json(text):
+    """Recover the JSON value from a model reply that isn't clean JSON.
+
+    Tries, in order: the whole text, each fenced code block, then the
+    repaired first JSON value in the text. Raises ValueError if nothing
+    can be recovered.
+    """
+    candidates = [text.strip()] + [m.group(1) for m in _FENCE.finditer(text)]
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            pass
+    for candidate in candidates[1:] + candidates[:1]:
+        repaired = repair_json(candidate)
+        if repaired is not None:
+            return json.loads(repaired)
+    raise ValueError("no recoverable JSON in response")
@@ -0,0 +1,164 @@
+# Incremental JSON scanning - emits array elements as soon as they close
+import json
+import re
+
+# Characters that change scanner state outside / inside strings. Below the
+# levels we care about, ':' and ',' don't matter and are skipped outright.
+_STRUCTURAL = re.compile(r'["{}\[\]:,]')
+_NESTED = re.compile(r'["{}\[\]]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+class ArrayItemStream:
+    """Feed JSON text in arbitrary chunks and get back each element of one
+    target array as soon as that element is complete.
+
+    With key=None the target is a top-level array (e.g. a dataLayer dump);
+    with key="findings" it is the array stored under that key of a top-level
+    object (e.g. an audit response). Anything before the root value (prose,
+    a markdown fence, "dataLayer =") and anything after it is ignored. Only
+    the element currently being read is buffered, so memory stays bounded by
+    the largest single element rather than the whole document.
+    """
+
+    def __init__(self, key=None):
+        self.key = key
+        self.errors = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._target_depth = None
+        self._target_seen = False
+        self._done = False
+        # Current element capture (list of text pieces, or None)
+        self._item_parts = None
+        # Depth-1 string capture, used to recognise the target key
+        self._string_parts = None
+        self._last_string = None
+        self._current_key = None
+
+    @property
+    def done(self):
+        return self._done
+
+    def feed(self, chunk):
+        """Consume the next chunk of text and return the elements it completed"""
+        items = []
+        i, n = 0, len(chunk)
+        item_start = 0
+        string_start = 0
+
+        if self._escape and n:
+            self._escape = False
+            i = 1
+
+        while i < n and not self._done:
+            if self._in_string:
+                m = _STRING_SPECIAL.search(chunk, i)
+                if m is None:
+                    i = n
+                    break
+                j = m.start()
+                if chunk[j] == "\\":
+                    if j + 1 >= n:
+                        self._escape = True
+                        i = n
+                        break
+                    i = j + 2
+                    continue
+                self._in_string = False
+                if self._string_parts is not None:
+                    self._string_parts.append(chunk[string_start:j])
+                    self._last_string = "".join(self._string_parts)
+                    self._string_parts = None
+                i = j + 1
+                continue
+
+            depth = len(self._stack)
+            pattern = _STRUCTURAL if depth <= 1 or depth == self._target_depth else _NESTED
+            m = pattern.search(chunk, i)
+            if m is None:
+                break
+            j = m.start()
+            c = chunk[j]
+            i = j + 1
+
+            if depth == 0:
+                # Skip everything before the root value
+                if c == ("[" if self.key is None else "{") and not self._target_seen:
+                    self._stack.append(c)
+                    if self.key is None:
+                        self._open_target(1)
+                        item_start = i
+                elif c == "{" and self.key is None:
+                    # The root is an object, not the array we're looking for
+                    self._done = True
+                continue
+
+            if c == '"':
+                self._in_string = True
+                if depth == 1 and self.key is not None:
+                    self._string_parts = []
+                    string_start = i
+            elif c == ":":
+                if depth == 1:
+                    self._current_key = self._last_string
+            elif c in "{[":
+                self._stack.append(c)
+                if (c == "[" and depth == 1 and self.key is not None
+                        and self._current_key == self.key and not self._target_seen):
+                    self._open_target(2)
+                    item_start = i
+            elif c in "}]":
+                self._stack.pop()
+                if self._target_depth is not None:
+                    if depth == self._target_depth:
+                        # The target array itself closed; flush a trailing scalar
+                        self._emit(items, chunk[item_start:j])
+                        self._target_depth = None
+                        if self.key is None:
+                            self._done = True
+                    elif depth - 1 == self._target_depth and self._item_parts is not None:
+                        # A container element closed
+                        self._emit(items, chunk[item_start:j + 1])
+                if not self._stack:
+                    self._done = True
+            elif c == ",":
+                if depth == self._target_depth:
+                    self._emit(items, chunk[item_start:j])
+                    self._item_parts = []
+                    item_start = i
+
+        # Carry partial captures over to the next chunk
+        if self._item_parts is not None and not self._done:
+            self._item_parts.append(chunk[item_start:])
+        if self._string_parts is not None and self._in_string:
+            self._string_parts.append(chunk[string_start:])
+        return items
+
+    def _open_target(self, depth):
+        self._target_depth = depth
+        self._target_seen = True
+        self._item_parts = []
+
+    def _emit(self, items, tail):
+        if self._item_parts is None:
+            return
+        self._item_parts.append(tail)
+        text = "".join(self._item_parts).strip()
+        self._item_parts = None
+        if not text:
+            return
+        try:
+            items.append(json.loads(text))
+        except json.JSONDecodeError:
+            self.errors += 1
+
+
+def iter_array_items(chunks, key=None):
+    """Yield the elements of the target array from an iterable of text chunks"""
+    stream = ArrayItemStream(key=key)
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+        if stream.done:
+            break
@@ -0,0 +1,240 @@
+# Claude call helpers - every audit and synthesis request goes through here
+import json
+from config import client, MODEL, MAX_TOKENS, MAX_CONTINUATIONS, CACHE_BYPASS, PROMPT_CACHING
+from cache import response_cache, make_key
+from jsonstream import ArrayItemStream, iter_array_items
+from jsonrepair import extract_json
+from ratelimit import is_retryable
+from telemetry import span, incr
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+
+def parse_json_response(response_text):
+    """Parse a JSON reply, recovering it from fences, prose or minor syntax damage.
+
+    Clean JSON (optionally in one markdown fence) takes the fast path;
+    anything else goes through jsonrepair.extract_json. Raises
+    json.JSONDecodeError if nothing can be recovered.
+    """
+    cleaned = response_text.strip()
+    if cleaned.startswith("```"):
+        lines = cleaned.split("\n")
+        cleaned = "\n".join(lines[1:-1])
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError as e:
+        try:
+            data = extract_json(response_text)
+        except ValueError:
+            raise e from None
+    incr("parse_repairs")
+    return data
+
+
+def complete_json(prompt, max_tokens=MAX_TOKENS, bypass_cache=False, on_finding=None, system=None,
+                  output=None, on_reply=None):
+    """Send a single-turn prompt and parse the JSON reply.
+
+    Returns (data, response_text); data is None when the reply can't be
+    recovered. Byte-identical requests are answered from the response cache
+    unless bypass_cache (or AUDIT_CACHE_BYPASS) is set. Only replies that
+    parse are cached, so a bad response is never replayed.
+
+    system is the static instruction prefix (see prompts.py). It is sent as a
+    system block marked with cache_control, so Anthropic's prompt cache
+    serves it on later requests and only prompt is billed at the full rate.
+
+    output is a schemas.StructuredOutput. Claude is then made to answer by
+    calling its tool, so the reply is the tool input JSON; it is normalised
+    and validated locally, and data is None if it still violates the schema.
+
+    Replies are streamed. If one stops at max_tokens, up to MAX_CONTINUATIONS
+    follow-up requests resume it where it stopped and the pieces are spliced
+    together, so the output already generated is kept. If on_finding is
+    given, on_finding(finding) is called for each object in the "findings"
+    array as soon as it closes. If on_reply is given, on_reply(data,
+    response_text) is called for a reply that came from the API (not the
+    response cache) and parsed.
+    """
+    key = make_key(MODEL, max_tokens, system or "", output.name if output else "", prompt)
+    if not (bypass_cache or CACHE_BYPASS):
+        cached = response_cache.get(key)
+        incr("response_cache", result="miss" if cached is None else "hit")
+        if cached is not None:
+            data = parse_json_response(cached)
+            if output:
+                data, _ = output.conform(data)
+            if on_finding:
+                for finding in data.get("findings", []):
+                    on_finding(finding)
+            return data, cached
+
+    request = {"model": MODEL, "max_tokens": max_tokens,
+               "messages": [{"role": "user", "content": prompt}]}
+    if system:
+        block = {"type": "text", "text": system}
+        if PROMPT_CACHING:
+            block["cache_control"] = {"type": "ephemeral"}
+        request["system"] = [block]
+    if output:
+        request["tools"] = [output.tool]
+        request["tool_choice"] = {"type": "tool", "name": output.name}
+
+    reporter = _FindingReporter(on_finding)
+    with span("api"):
+        response_text, stop_reason = _stream_reply(request, reporter)
+        continuations = 0
+        while stop_reason == "max_tokens" and continuations < MAX_CONTINUATIONS and response_text.strip():
+            continuations += 1
+            incr("continuations")
+            more, stop_reason = _stream_reply(continuation_request(request, response_text), reporter,
+                                              prefix=response_text.rstrip())
+            response_text = splice_continuation(response_text, more)
+        if stop_reason == "max_tokens":
+            incr("truncated_replies")
+
+    try:
+        with span("parse"):
+            data = parse_json_response(response_text)
+    except json.JSONDecodeError:
+        incr("parse_failures")
+        return None, response_text
+
+    if output:
+        data, errors = output.conform(data)
+        if errors:
+            incr("schema_failures")
+            return None, response_text + "\n\nSchema errors: " + "; ".join(errors[:5])
+
+    response_cache.set(key, response_text)
+    if on_reply:
+        on_reply(data, response_text)
+    return data, response_text
+
+
+def _tool_call(message):
+    return next((block for block in message.content if getattr(block, "type", None) == "tool_use"), None)
+
+
+def response_payload(message):
+    """The reply as JSON text: the forced tool call's input, else the text blocks"""
+    block = _tool_call(message)
+    if block is not None:
+        return json.dumps(block.input)
+    return "".join(getattr(block, "text", "") for block in message.content)
+
+
+def continuation_request(request, partial):
+    """The request that resumes a reply cut off at max_tokens.
+
+    The partial reply is sent back as a prefilled assistant turn so Claude
+    continues the JSON text from the exact point it stopped. Tools stay in
+    the request (keeping the prompt cache prefix) but can't be called, since
+    a prefilled turn can't be resumed as a tool call.
+    """
+    follow_up = dict(request)
+    # Only the prefill copy is stripped: the API rejects a final assistant turn ending in whitespace
+    follow_up["messages"] = request["messages"] + [{"role": "assistant", "content": partial.rstrip()}]
+    if "tool_choice" in request:
+        follow_up["tool_choice"] = {"type": "none"}
+    return follow_up
+
+
+def splice_continuation(partial, more):
+    """partial followed by its continuation more, keeping the whitespace at the cut point.
+
+    The prefill sent in continuation_request has partial's trailing
+    whitespace stripped (the API rejects it), so Claude regenerates that
+    whitespace at the start of more; it is dropped there instead of from
+    partial, where it may belong to a string value.
+    """
+    if partial != partial.rstrip():
+        more = more.lstrip()
+    return partial + more
+
+
+class _FindingReporter:
+    """Passes each finding of a reply to on_finding once, as soon as it closes"""
+
+    def __init__(self, on_finding):
+        self.on_finding = on_finding
+        self.stream = ArrayItemStream(key="findings")
+        self.seen = 0
+        self.reported = 0
+
+    def feed(self, text):
+        if not self.on_finding:
+            return
+        for finding in self.stream.feed(text):
+            if isinstance(finding, dict):
+                self.seen += 1
+                if self.seen > self.reported:
+                    self.reported += 1
+                    self.on_finding(finding)
+
+    def restart(self, prefix=""):
+        """Read a reply that is being streamed again from after prefix, skipping findings already reported"""
+        self.stream = ArrayItemStream(key="findings")
+        self.seen = 0
+        self.feed(prefix)
+
+    def replay(self, full_text):
+        """Report the findings in full_text beyond those already reported"""
+        if not self.on_finding:
+            return
+        findings = [f for f in iter_array_items([full_text], key="findings") if isinstance(f, dict)]
+        for finding in findings[self.reported:]:
+            self.reported += 1
+            self.on_finding(finding)
+
+
+def _stream_reply(request, reporter, prefix="", fallback=True):
+    """Stream one response into reporter; returns (text, stop_reason).
+
+    Both text deltas and tool-input JSON deltas are collected, so the raw
+    reply is kept even if it is cut off or malformed. Errors while opening
+    the stream are retried by the client wrapper. If the stream breaks
+    part-way (e.g. an overloaded_error event), the reply is requested again
+    without streaming and only the findings beyond those already reported
+    are passed on. A non-streamed tool call cut off at max_tokens has no
+    usable input to continue from, so that one is streamed once more
+    instead. prefix is the part of the reply that earlier requests produced
+    (for continuations).
+    """
+    parts = []
+    opened = False
+    try:
+        with client.messages.stream(**request) as stream:
+            opened = True
+            for event in stream:
+                if getattr(event, "type", None) != "content_block_delta":
+                    continue
+                delta = event.delta
+                text = delta.partial_json if delta.type == "input_json_delta" else getattr(delta, "text", "")
+                if not text:
+                    continue
+                parts.append(text)
+                reporter.feed(text)
+            message = stream.get_final_message()
+    except Exception as e:
+        if not opened or not fallback or not is_retryable(e):
+            raise
+        response = client.messages.create(**request)
+        _record_usage(response.usage)
+        if response.stop_reason == "max_tokens" and _tool_call(response) is not None:
+            incr("stream_restarts")
+            reporter.restart(prefix)
+            return _stream_reply(request, reporter, prefix, fallback=False)
+        response_text = response_payload(response)
+        reporter.replay(prefix + response_text)
+        return response_text, response.stop_reason
+    _record_usage(message.usage)
+    return "".join(parts), message.stop_reason
+
+
+def _record_usage(usage):
+    """Count the response's token usage (cache read/write included) under the current span"""
+    incr("api_responses")
+    for field in USAGE_FIELDS:
+        incr(field, getattr(usage, field, None) or 0)
@@ -2,23 +2,43 @@
 """
 Analytics Audit Tool
 Powered by Claude API - Audits GA4, GTM, and DataLayer implementations
+
+Usage:
+    python main.py                                   # guided interactive intake
+    python main.py --setup site.json                 # setup file, JSON on stdout
+    python main.py --industry "SaaS / Software" --website-type "Web application (SaaS)" \
+        --gtm @container.json --datalayer - --format ndjson < dump.json
+
+Any argument switches to non-interactive mode: nothing is asked, the result
+is written to stdout as JSON, NDJSON or the text report, progress goes to
+stderr, and the exit code says how it went (see EXIT_* below).
 """
 
+import argparse
 import sys
 import os
+import json
+import threading
 
 # Add project root to path so imports work
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from intake import run_intake
-from auditors.ga4_auditor import audit_ga4
-from auditors.gtm_auditor import audit_gtm
-from auditors.datalayer_auditor import audit_datalayer
-from report import print_report
-from export_html import export_report
+from intake import run_intake, build_setup, read_payload, SETUP_DEFAULTS, PAYLOAD_FIELDS
+from runner import run_audits, SECTION_AUDITORS
+from report import print_report, print_streamed_finding
+from config import RETRY_BUDGET, METRICS_PROM_PATH, SYNTHESIS_MODE, client
+from cache import response_cache
+from ratelimit import retry_budget
+from telemetry import collect, format_summary, write_prometheus
+
+EXIT_OK = 0
+EXIT_ERROR = 1          # the run failed (API error, retry budget spent, ...)
+EXIT_USAGE = 2          # bad arguments or unreadable inputs
+EXIT_PARTIAL = 3        # report produced, but at least one section could not be audited
+EXIT_INTERRUPTED = 130
 
 
-def main():
+def run_session():
     print("\n")
     print("╔" + "═" * 58 + "╗")
     print("║     🔍 ANALYTICS TRACKING AUDIT TOOL                  ║")
@@ -29,29 +49,55 @@ def main():
     # Step 1: Gather information
     setup = run_intake()
     
-    # Step 2: Run audits
+    # Step 2: Run audits (metrics cover the run itself, not the time spent answering prompts)
     print("\n\n⏳ Running audits... This may take a minute.\n")
+    print("  Auditing GA4 events, GTM container and dataLayer in parallel...")
     
-    print("  [1/3] Auditing GA4 event coverage...")
-    ga4_results = audit_ga4(setup)
-    print("  ✅ GA4 audit complete")
+    completed = []
+    print_lock = threading.Lock()
     
-    print("  [2/3] Auditing GTM container health...")
-    gtm_results = audit_gtm(setup)
-    print("  ✅ GTM audit complete")
+    def on_finding(section, finding):
+        with print_lock:
+            print_streamed_finding(SECTION_AUDITORS[section][0], finding)
     
-    print("  [3/3] Auditing dataLayer quality...")
-    datalayer_results = audit_datalayer(setup)
-    print("  ✅ DataLayer audit complete")
+    def on_complete(section, results):
+        completed.append(section)
+        label = SECTION_AUDITORS[section][0]
+        with print_lock:
+            print(f"  ✅ [{len(completed)}/3] {label} audit complete")
     
-    # Step 3: Display terminal report
-    print_report(ga4_results, gtm_results, datalayer_results)
+    with collect() as run_metrics:
+        # Rate-limit retries for every request of this run come out of one budget
+        with retry_budget(RETRY_BUDGET):
+            results = run_audits(setup, on_complete=on_complete, on_finding=on_finding)
+            ga4_results = results["ga4"]
+            gtm_results = results["gtm"]
+            datalayer_results = results["datalayer"]
+            
+            print("  🧠 Generating strategic recommendations...")
+            from synthesizer import synthesize_results
+            synthesis = synthesize_results(ga4_results, gtm_results, datalayer_results, setup)
+        
+        # Step 3: Display terminal report
+        print_report(ga4_results, gtm_results, datalayer_results, synthesis)
+    
+    # Step 4: Where the time and tokens went
+    print("\n📈 RUN METRICS")
+    print(format_summary(run_metrics))
+    print("  API client (requests, retries, time spent throttled):")
+    print(json.dumps(client.get_stats(), indent=2))
+    print("  Response cache (hits per tier, misses, entries held):")
+    print(json.dumps(response_cache.get_stats(), indent=2))
+    if METRICS_PROM_PATH:
+        write_prometheus(METRICS_PROM_PATH, run_metrics)
+        print(f"  Prometheus metrics written to: {METRICS_PROM_PATH}")
     
-    # Step 4: Offer HTML export
+    # Step 5: Offer HTML export
     print("\n")
     export_choice = input("📄 Export report as HTML file? (y/n): ").strip().lower()
     
     if export_choice == 'y':
+        from export_html import export_report
         filepath = export_report(ga4_results, gtm_results, datalayer_results, setup)
         print(f"\n  ✅ Report saved to: {filepath}")
         print(f"  📂 Open it in your browser to see the formatted report.")
@@ -63,5 +109,136 @@ def main():
             pass
 
 
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Audit a GA4 / GTM / dataLayer setup. Without arguments the guided intake runs.",
+        epilog="Payloads (--ga4, --gtm, --datalayer and the same fields in a setup file) take inline text, "
+               "@path to read a file, or - to read stdin (at most one of them).")
+    parser.add_argument("--setup", help="JSON setup file (or - for stdin) with the intake fields; "
+                                        "@file payloads in it are relative to the file")
+    parser.add_argument("--industry", help="e.g. 'E-commerce / Retail'")
+    parser.add_argument("--website-type", help="e.g. 'E-commerce store'")
+    parser.add_argument("--platform", help="e.g. Shopify, WordPress, Next.js")
+    parser.add_argument("--goals", help="comma-separated analytics goals")
+    parser.add_argument("--ga4", dest="ga4_events", help="GA4 event list")
+    parser.add_argument("--gtm", dest="gtm_tags", help="GTM container export or tag list")
+    parser.add_argument("--datalayer", dest="datalayer_sample", help="dataLayer dump (JSON array)")
+    parser.add_argument("--format", choices=["json", "ndjson", "text"], default="json",
+                        help="stdout format: one JSON document (default), NDJSON events as "
+                             "findings stream in, or the text report")
+    parser.add_argument("--html", metavar="PATH", help="also write the HTML report to PATH")
+    parser.add_argument("--synthesis", choices=["llm", "local"], default=SYNTHESIS_MODE,
+                        help="strategic plan from Claude (default; NDJSON gets the local plan first) "
+                             "or built locally from the findings with no API call")
+    parser.add_argument("--fresh", action="store_true", help="bypass the response cache")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress messages on stderr")
+    return parser.parse_args(argv)
+
+
+def load_cli_setup(args):
+    """Setup from --setup plus the individual flags (flags win); raises ValueError / OSError"""
+    record, base_dir = {}, "."
+    if args.setup:
+        if args.setup == "-":
+            record = json.load(sys.stdin)
+        else:
+            with open(args.setup, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            base_dir = os.path.dirname(os.path.abspath(args.setup))
+        if not isinstance(record, dict):
+            raise ValueError(f"{args.setup}: expected a JSON object")
+    for field in ("industry", "website_type", "platform", "goals") + PAYLOAD_FIELDS:
+        value = getattr(args, field)
+        if value is not None:
+            record[field] = value
+    stdin_users = [field for field in PAYLOAD_FIELDS if record.get(field) == "-"]
+    if len(stdin_users) + (args.setup == "-") > 1:
+        raise ValueError("only one input can be read from stdin")
+    # @paths from flags are relative to the working directory, from the setup file to the file
+    flagged = {field: record.pop(field) for field in PAYLOAD_FIELDS if getattr(args, field) is not None}
+    setup = build_setup(record, base_dir)
+    for field, value in flagged.items():
+        setup[field] = read_payload(value, field)
+    return setup
+
+
+def run_headless(args):
+    """Audit without prompts and write the result to stdout; returns the exit code"""
+    def progress(message):
+        if not args.quiet:
+            print(message, file=sys.stderr, flush=True)
+
+    try:
+        setup = load_cli_setup(args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    write_lock = threading.Lock()
+
+    def emit(record):
+        with write_lock:
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+
+    on_finding = None
+    if args.format == "ndjson":
+        on_finding = lambda section, finding: emit({"type": "finding", "section": section, "finding": finding})
+
+    def on_complete(section, results):
+        progress(f"  ✅ {SECTION_AUDITORS[section][0]} audit complete")
+        if args.format == "ndjson":
+            emit({"type": "section", "section": section, "result": results})
+
+    try:
+        with collect() as run_metrics:
+            progress("⏳ Auditing GA4 events, GTM container and dataLayer...")
+            with retry_budget(RETRY_BUDGET):
+                results = run_audits(setup, on_complete=on_complete, on_finding=on_finding,
+                                     bypass_cache=args.fresh)
+                progress("  🧠 Generating strategic recommendations...")
+                from synthesizer import synthesize_results, local_synthesis
+                if args.format == "ndjson" and args.synthesis != "local":
+                    # Instant plan first; Claude's synthesis follows as a second synthesis event
+                    emit({"type": "synthesis", "synthesis": local_synthesis(results["ga4"], results["gtm"],
+                                                                            results["datalayer"], setup)})
+                synthesis = synthesize_results(results["ga4"], results["gtm"], results["datalayer"], setup,
+                                               bypass_cache=args.fresh, mode=args.synthesis)
+            if args.html:
+                from export_html import export_report
+                export_report(results["ga4"], results["gtm"], results["datalayer"], setup, filepath=args.html)
+                progress(f"  📄 HTML report written to {args.html}")
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        print(f"error: {type(e).__name__}: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    metrics = run_metrics.summary()
+    if METRICS_PROM_PATH:
+        write_prometheus(METRICS_PROM_PATH, run_metrics)
+    failed = [section for section, result in results.items() if result.get("audit_failed")]
+
+    if args.format == "ndjson":
+        emit({"type": "synthesis", "synthesis": synthesis})
+        emit({"type": "done", "failed_sections": failed, "metrics": metrics})
+    elif args.format == "json":
+        output = {"setup": {k: setup[k] for k in SETUP_DEFAULTS}, **results, "synthesis": synthesis,
+                  "failed_sections": failed, "metrics": metrics}
+        json.dump(output, sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write("\n")
+    else:
+        print_report(results["ga4"], results["gtm"], results["datalayer"], synthesis)
+    return EXIT_PARTIAL if failed else EXIT_OK
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return run_headless(parse_args(argv))
+    run_session()
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
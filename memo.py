@@ -0,0 +1,85 @@
+# Audit memoization - shares finished section audits and syntheses across runs and
+# Streamlit sessions in this process, and coalesces identical in-flight requests
+import copy
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from config import MEMO_MAX_ENTRIES, MEMO_TTL_SECONDS
+from telemetry import incr
+
+
+class Memo:
+    """Bounded, expiring memo with single-flight coalescing.
+
+    get_or_compute(key, compute) returns a stored value if one is fresh;
+    otherwise the first caller for a key runs compute() and any caller that
+    arrives while it runs waits for that result instead of starting its own.
+    Values are deep-copied in and out, so callers can't mutate each other's
+    results. Exceptions reach every waiting caller and nothing is stored;
+    neither is a value for which keep(value) is false.
+    """
+
+    def __init__(self, name, max_entries=MEMO_MAX_ENTRIES, ttl=MEMO_TTL_SECONDS):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, keep=None, refresh=False):
+        """Value for key, computing it at most once at a time; returns (value, status).
+
+        status is "hit", "coalesced" or "miss". With refresh the stored value
+        is ignored (but an identical in-flight call is still joined) and the
+        new result replaces it.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not refresh:
+                value, stored_at = entry
+                if time.monotonic() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    incr("memo", memo=self.name, result="hit")
+                    return copy.deepcopy(value), "hit"
+                del self._entries[key]
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+
+        if not leader:
+            incr("memo", memo=self.name, result="coalesced")
+            return copy.deepcopy(future.result()), "coalesced"
+
+        incr("memo", memo=self.name, result="miss")
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        stored = copy.deepcopy(value)
+        with self._lock:
+            del self._in_flight[key]
+            if keep is None or keep(value):
+                self._entries[key] = (stored, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        future.set_result(stored)
+        return value, "miss"
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+audit_memo = Memo("audit")
+synthesis_memo = Memo("synthesis")
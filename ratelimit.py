@@ -0,0 +1,290 @@
+# Rate limiting and retries - every Claude request goes through RateLimitedClient
+import contextvars
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from telemetry import incr
+
+# 408 timeout, 409 conflict, 429 rate limit, 5xx server errors, 529 overloaded
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+# Error types Anthropic reports inside an SSE stream, where the HTTP status is already 200
+RETRYABLE_ERROR_TYPES = {"rate_limit_error", "overloaded_error", "api_error"}
+
+CHARS_PER_TOKEN = 4
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute.
+
+    acquire(amount) blocks until the bucket holds amount, so callers are
+    spread out evenly instead of bursting into the API's limit. A rate of
+    0 or None disables the bucket.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = (rate_per_minute or 0) / 60.0
+        self.capacity = capacity or rate_per_minute or 0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Block until amount is available and take it; returns the seconds waited"""
+        if not self.rate:
+            return 0.0
+        # A single request bigger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        started = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.level >= amount:
+                        self.level -= amount
+                        return now - started
+                    wait = (amount - self.level) / self.rate
+            time.sleep(wait)
+
+    def debit(self, amount):
+        """Charge usage measured after the fact; the level may go negative"""
+        if not self.rate:
+            return
+        with self.lock:
+            self._refill(time.monotonic())
+            self.level -= amount
+
+    def pause(self, seconds):
+        """Hold every caller for seconds (used when the API says to back off)"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RetryBudget:
+    """Caps the total number of retries across every request of one run"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+
+_current_budget = contextvars.ContextVar("retry_budget", default=None)
+
+
+@contextmanager
+def retry_budget(limit):
+    """Share one RetryBudget across every request made inside the block.
+
+    Work submitted to thread pools with submit_with_context inherits the
+    budget, so all sections and shards of a run draw from the same pool.
+    """
+    budget = RetryBudget(limit)
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def submit_with_context(pool, fn, *args, **kwargs):
+    """pool.submit that carries the caller's context (and so its retry budget) into the worker"""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def is_retryable(error):
+    # Not imported until the client is built; before that nothing can be an SDK error
+    anthropic = sys.modules.get("anthropic")
+    if anthropic is None:
+        return False
+    if isinstance(error, anthropic.APIConnectionError):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        if error.status_code in RETRYABLE_STATUS:
+            return True
+        body = error.body if isinstance(error.body, dict) else {}
+        return body.get("error", {}).get("type") in RETRYABLE_ERROR_TYPES
+    return False
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait (retry-after-ms / retry-after), or None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                from email.utils import parsedate_to_datetime
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def estimate_tokens(request):
+    """Rough input-token count of a messages request, for the tokens/min bucket"""
+    chars = sum(len(block.get("text", "")) for block in request.get("system") or [] if isinstance(block, dict))
+    if isinstance(request.get("system"), str):
+        chars = len(request["system"])
+    for message in request.get("messages", []):
+        content = message.get("content", "")
+        chars += len(content) if isinstance(content, str) else len(str(content))
+    return chars // CHARS_PER_TOKEN + 1
+
+
+class RateLimitedClient:
+    """Drop-in wrapper for anthropic.Anthropic: client.messages.create / .stream.
+
+    Every request first takes one slot from the requests/min bucket and its
+    estimated input tokens from the tokens/min bucket (output tokens are
+    charged once the response reports them). Retryable failures (429, 529,
+    5xx, timeouts, dropped connections) are retried with full-jitter
+    exponential backoff, or after exactly Retry-After when the API sends it;
+    a 429 also pauses both buckets so concurrent workers back off together.
+    Retries stop after max_retries for one request, or when the active
+    retry_budget() is spent. Pass either the client or a factory that builds
+    it on the first request.
+    """
+
+    def __init__(self, client=None, requests_per_minute=None, tokens_per_minute=None, max_retries=6,
+                 backoff_base=1.0, backoff_max=60.0, factory=None):
+        self._client = client
+        self._factory = factory
+        self._client_lock = threading.Lock()
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.messages = _Messages(self)
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "rate_limited": 0, "overloaded": 0,
+                       "failed": 0, "throttled_seconds": 0.0, "backoff_seconds": 0.0}
+
+    @property
+    def client(self):
+        """The wrapped client, built by factory on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def backoff(self, attempt, server_delay=None):
+        if server_delay is not None:
+            return server_delay + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, request, send):
+        """Run send() under the limiter, retrying retryable errors; returns its result"""
+        attempt = 0
+        while True:
+            waited = self.requests.acquire(1) + self.tokens.acquire(estimate_tokens(request))
+            self._count("requests", throttled_seconds=waited)
+            if waited:
+                incr("rate_limit_wait_seconds", waited)
+            try:
+                return send()
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self._count("failed")
+                    raise
+                budget = _current_budget.get()
+                if budget is not None and not budget.take():
+                    self._count("failed")
+                    raise
+                status = getattr(e, "status_code", None)
+                server_delay = retry_after(e)
+                delay = self.backoff(attempt, server_delay)
+                if status == 429:
+                    self._count("rate_limited")
+                    self.requests.pause(delay)
+                    self.tokens.pause(delay)
+                elif status == 529:
+                    self._count("overloaded")
+                self._count("retries", backoff_seconds=delay)
+                incr("api_retries", status=status or type(e).__name__)
+                attempt += 1
+                time.sleep(delay)
+
+    def charge_usage(self, usage):
+        """Debit output tokens (unknown until the response) from the tokens/min bucket"""
+        self.tokens.debit(getattr(usage, "output_tokens", 0) or 0)
+
+    def _count(self, key, **seconds):
+        with self._stats_lock:
+            self._stats[key] += 1
+            for name, value in seconds.items():
+                self._stats[name] += value
+
+    def get_stats(self):
+        """Process-wide request, retry and throttle counts, shown in the diagnostics and CLI run metrics"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["throttled_seconds"] = round(stats["throttled_seconds"], 2)
+        stats["backoff_seconds"] = round(stats["backoff_seconds"], 2)
+        return stats
+
+
+class _Messages:
+    def __init__(self, limited):
+        self._limited = limited
+
+    def create(self, **request):
+        response = self._limited.call(request, lambda: self._limited.client.messages.create(**request))
+        self._limited.charge_usage(response.usage)
+        return response
+
+    @contextmanager
+    def stream(self, **request):
+        """Like client.messages.stream; retries happen while opening the stream.
+
+        An error after text has started arriving is raised to the caller,
+        which decides whether a retry is safe (see llm._stream_reply).
+        """
+        managers = []
+
+        def open_stream():
+            manager = self._limited.client.messages.stream(**request)
+            stream = manager.__enter__()
+            managers.append(manager)
+            return stream
+
+        stream = self._limited.call(request, open_stream)
+        try:
+            yield stream
+        except BaseException:
+            # The SDK's manager sees the caller's error, as it would without this wrapper
+            if not managers[-1].__exit__(*sys.exc_info()):
+                raise
+            return
+        managers[-1].__exit__(None, None, None)
+        try:
+            usage = stream.current_message_snapshot.usage
+        except Exception:
+            return
+        self._limited.charge_usage(usage)
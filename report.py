@@ -1,7 +1,17 @@
 # Report formatter - takes audit results and displays them
 from config import SEVERITY
+from dedup import visible_findings, also_reported_in
+from telemetry import timed
 
-def print_report(ga4_results, gtm_results, datalayer_results):
+def print_streamed_finding(label, finding):
+    """Print a one-line preview of a finding as soon as it streams in"""
+    sev = finding.get("severity", "info")
+    icon = SEVERITY.get(sev, "⚪")
+    print(f"     {icon} [{label}] {finding.get('issue', 'N/A')}")
+
+
+@timed("print_report")
+def print_report(ga4_results, gtm_results, datalayer_results, synthesis=None):
     """Format and display the complete audit report"""
     
     print("\n")
@@ -36,7 +46,8 @@ def print_report(ga4_results, gtm_results, datalayer_results):
         print(f"{'=' * 58}")
         print(f"\n Summary: {results.get('summary', 'N/A')}\n")
         
-        findings = results.get("findings", [])
+        # Findings another section already reports are shown there, once
+        findings = visible_findings(results)
         
         # Sort by severity
         severity_order = {"critical": 0, "high": 1, "medium": 2, "low": 3, "info": 4}
@@ -52,7 +63,25 @@ def print_report(ga4_results, gtm_results, datalayer_results):
             print(f"    Details:   {finding.get('details', 'N/A')}")
             print(f"    Fix:       {finding.get('fix', 'N/A')}")
             print(f"    Impact:    {finding.get('business_impact', 'N/A')}")
+            if finding.get("also_reported_in"):
+                print(f"    Also in:   {also_reported_in(finding)}")
+            print()
+    
+    # Strategic synthesis
+    if synthesis:
+        print(f"\n\n{'=' * 58}")
+        print(" 🧠 STRATEGIC RECOMMENDATIONS")
+        print(f"{'=' * 58}")
+        health = synthesis.get("overall_health", "needs_attention")
+        print(f"\n Health:  {health.upper().replace('_', ' ')}")
+        print(f"\n {synthesis.get('executive_summary', 'N/A')}\n")
+        for i, item in enumerate(synthesis.get("immediate_actions", []), 1):
+            print(f"  {i}. {item.get('action', 'N/A')}")
+            print(f"     Why:    {item.get('why', '')}")
+            print(f"     Effort: {item.get('effort', 'N/A')} | Impact: {item.get('impact', '')}")
             print()
+        print(f" 30-day plan: {synthesis.get('30_day_plan', 'N/A')}")
+        print(f" 90-day plan: {synthesis.get('90_day_plan', 'N/A')}")
     
     # Priority action items
     print(f"\n{'=' * 58}")
@@ -60,9 +89,9 @@ def print_report(ga4_results, gtm_results, datalayer_results):
     print(f"{'=' * 58}\n")
     
     all_findings = (
-        ga4_results.get("findings", []) + 
-        gtm_results.get("findings", []) + 
-        datalayer_results.get("findings", [])
+        visible_findings(ga4_results) + 
+        visible_findings(gtm_results) + 
+        visible_findings(datalayer_results)
     )
     
     critical_high = [f for f in all_findings if f.get("severity") in ("critical", "high")]
@@ -0,0 +1,157 @@
+# Audit runner - fans the section auditors out concurrently
+import copy
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import AUDIT_WORKERS, MODEL
+from cache import make_key
+from dedup import dedupe_findings
+from memo import audit_memo
+from ratelimit import submit_with_context
+from telemetry import incr
+from auditors.ga4_auditor import audit_ga4
+from auditors.gtm_auditor import audit_gtm
+from auditors.datalayer_auditor import audit_datalayer
+from auditors.datalayer_stream import DumpFile
+
+# Section key -> (display label, auditor)
+SECTION_AUDITORS = {
+    "ga4": ("GA4", audit_ga4),
+    "gtm": ("GTM", audit_gtm),
+    "datalayer": ("DataLayer", audit_datalayer)
+}
+SECTION_PAYLOADS = {"ga4": "ga4_events", "gtm": "gtm_tags", "datalayer": "datalayer_sample"}
+SETUP_ANSWERS = ("industry", "website_type", "platform")
+
+_SPACE = re.compile(r"\s+")
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def _file_digest(path):
+    """sha256 of a file's content with CRLF line endings read as LF, hashed in chunks"""
+    digest = hashlib.sha256()
+    carry = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            chunk = carry + chunk
+            # A trailing CR may be the first half of a CRLF split across chunks
+            carry = b"\r" if chunk.endswith(b"\r") else b""
+            digest.update(chunk[:len(chunk) - len(carry)].replace(b"\r\n", b"\n"))
+    digest.update(carry)
+    return digest.hexdigest()
+
+
+def payload_fingerprint(value):
+    """Content identity of a pasted payload, DumpFile or upload; None if it can't be taken (stdin).
+
+    Line endings and surrounding whitespace of pasted text don't count, and
+    files are identified by content, so a re-exported but unchanged file
+    keeps its fingerprint.
+    """
+    if not value:
+        return ""
+    if isinstance(value, str):
+        text = value.replace("\r\n", "\n").strip()
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    if isinstance(value, DumpFile):
+        if value.path == "-":
+            return None
+        try:
+            return ["file", _file_digest(value.path)]
+        except OSError:
+            return None
+    if hasattr(value, "getvalue"):
+        data = value.getvalue()
+        return hashlib.sha256(data if isinstance(data, bytes) else data.encode("utf-8")).hexdigest()
+    return None
+
+
+def section_key(section, setup):
+    """Input fingerprint of one section audit: the normalised setup answers plus that section's payload.
+
+    Keys the memo and is stored in each result as "input_fingerprint".
+    """
+    payload = payload_fingerprint(setup.get(SECTION_PAYLOADS[section]))
+    if payload is None:
+        return None
+    answers = [_SPACE.sub(" ", str(setup.get(field) or "")).strip() for field in SETUP_ANSWERS]
+    goals = sorted({g.strip() for g in setup.get("goals") or [] if g.strip()})
+    return make_key("section", section, MODEL, answers, goals, payload)
+
+
+def run_section(section, setup, bypass_cache=False, on_finding=None, previous=None):
+    """Run one section audit through the process-wide memo.
+
+    Identical audits (same normalised setup answers and payload) within
+    MEMO_TTL_SECONDS are answered from the memo, and identical audits already
+    running elsewhere (another Streamlit session, say) are waited on rather
+    than repeated. previous is an earlier result for this section (from last
+    week's results.json; only batch.py passes one); it is reused as-is if its
+    input_fingerprint matches and it didn't fail. Either way on_finding still
+    sees every finding. Failed audits are never kept. bypass_cache forces a
+    fresh audit.
+    """
+    auditor = SECTION_AUDITORS[section][1]
+    key = section_key(section, setup)
+    if key is None:
+        return auditor(setup, bypass_cache, on_finding)
+    if (previous and not bypass_cache and previous.get("input_fingerprint") == key
+            and not previous.get("audit_failed")):
+        incr("sections_reused", section=section)
+        result, status = copy.deepcopy(previous), "reused"
+    else:
+        result, status = audit_memo.get_or_compute(
+            key, lambda: auditor(setup, bypass_cache, on_finding),
+            keep=lambda result: not result.get("audit_failed"), refresh=bypass_cache
+        )
+    if status != "miss" and on_finding:
+        for finding in result.get("findings", []):
+            on_finding(finding)
+    result["input_fingerprint"] = key
+    return result
+
+
+def changed_sections(results, previous):
+    """Sections whose input differs from previous (all of them when there is no previous run)"""
+    previous = previous or {}
+    return [section for section in SECTION_AUDITORS
+            if results[section].get("input_fingerprint") is None
+            or results[section].get("input_fingerprint") != (previous.get(section) or {}).get("input_fingerprint")]
+
+
+def run_audits(setup, on_complete=None, max_workers=AUDIT_WORKERS, bypass_cache=False,
+               on_finding=None, previous=None):
+    """Run the GA4, GTM and dataLayer audits concurrently.
+
+    Each auditor is an independent API round-trip, so they are submitted to a
+    bounded thread pool and wall-clock time tracks the slowest one. If given,
+    on_complete(section, results) is called as each audit finishes, in
+    completion order. If given, on_finding(section, finding) is called from the
+    worker threads for each finding as it streams in. Sections go through
+    run_section, so repeated audits are memoized. previous is an earlier
+    result set for the same site: sections whose input fingerprint is
+    unchanged are taken from it instead of being audited again. bypass_cache
+    skips the memo, previous and the response cache. Once all sections are
+    in, findings that several sections report are marked by
+    dedup.dedupe_findings. Returns a dict keyed by section ("ga4", "gtm",
+    "datalayer").
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {}
+        for section in SECTION_AUDITORS:
+            section_on_finding = None
+            if on_finding:
+                section_on_finding = lambda finding, section=section: on_finding(section, finding)
+            futures[submit_with_context(pool, run_section, section, setup, bypass_cache, section_on_finding,
+                                        (previous or {}).get(section))] = section
+        for future in as_completed(futures):
+            section = futures[future]
+            results[section] = future.result()
+            if on_complete:
+                on_complete(section, results[section])
+    dedupe_findings(results)
+    return results
@@ -0,0 +1,180 @@
+# Output schemas - the tool definitions Claude answers through, plus local validation
+SEVERITIES = ["critical", "high", "medium", "low", "info"]
+HEALTH_LEVELS = ["critical", "needs_attention", "fair", "good", "excellent"]
+
+SEVERITY_ALIASES = {"severe": "critical", "blocker": "critical", "major": "high", "moderate": "medium",
+                    "minor": "low", "informational": "info", "information": "info", "note": "info"}
+FINDING_TEXT_FIELDS = ["category", "details", "fix", "business_impact"]
+# Score penalties used only when a reply omits the score
+SCORE_PENALTIES = {"critical": 15, "high": 8, "medium": 4, "low": 1, "info": 0}
+
+FINDING_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "issue": {"type": "string", "description": "One-line statement of the problem"},
+        "severity": {"type": "string", "enum": SEVERITIES},
+        "category": {"type": "string", "description": "Short snake_case label, e.g. missing_event, duplicate, pii"},
+        "details": {"type": "string"},
+        "fix": {"type": "string", "description": "Concrete implementation steps"},
+        "business_impact": {"type": "string"}
+    },
+    "required": ["issue", "severity", "category", "details", "fix", "business_impact"]
+}
+
+AUDIT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "findings": {"type": "array", "items": FINDING_SCHEMA},
+        "score": {"type": "integer", "minimum": 0, "maximum": 100},
+        "summary": {"type": "string"}
+    },
+    "required": ["findings", "score", "summary"]
+}
+
+SYNTHESIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "executive_summary": {"type": "string"},
+        "overall_health": {"type": "string", "enum": HEALTH_LEVELS},
+        "immediate_actions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "action": {"type": "string"},
+                    "why": {"type": "string"},
+                    "effort": {"type": "string", "description": "hours, days or weeks"},
+                    "impact": {"type": "string"}
+                },
+                "required": ["action", "why", "effort", "impact"]
+            }
+        },
+        "30_day_plan": {"type": "string"},
+        "90_day_plan": {"type": "string"},
+        "estimated_data_quality_improvement": {"type": "string"},
+        "risks_of_inaction": {"type": "string"}
+    },
+    "required": ["executive_summary", "overall_health", "immediate_actions", "30_day_plan",
+                 "90_day_plan", "estimated_data_quality_improvement", "risks_of_inaction"]
+}
+
+_TYPES = {"object": dict, "array": list, "string": str, "integer": int, "number": (int, float), "boolean": bool}
+
+
+def validate(instance, schema, path="$"):
+    """Check instance against the JSON Schema subset used here; returns a list of error strings"""
+    expected = schema.get("type")
+    if expected:
+        if not isinstance(instance, _TYPES[expected]) or (expected in ("integer", "number") and isinstance(instance, bool)):
+            return [f"{path}: expected {expected}, got {type(instance).__name__}"]
+    errors = []
+    if "enum" in schema and instance not in schema["enum"]:
+        errors.append(f"{path}: {instance!r} not one of {schema['enum']}")
+    if "minimum" in schema and instance < schema["minimum"]:
+        errors.append(f"{path}: {instance} < {schema['minimum']}")
+    if "maximum" in schema and instance > schema["maximum"]:
+        errors.append(f"{path}: {instance} > {schema['maximum']}")
+    if expected == "object":
+        for key in schema.get("required", []):
+            if key not in instance:
+                errors.append(f"{path}: missing {key}")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in instance:
+                errors.extend(validate(instance[key], subschema, f"{path}.{key}"))
+    elif expected == "array" and "items" in schema:
+        for i, item in enumerate(instance):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def _text(value):
+    if value is None:
+        return ""
+    return value if isinstance(value, str) else str(value)
+
+
+def normalize_audit(data):
+    """Coerce near-miss audit replies into AUDIT_SCHEMA shape.
+
+    Lowercases and maps severity synonyms, drops findings without an issue,
+    fills missing text fields, parses and clamps the score (estimating it
+    from severities if absent). Anything it can't fix is left for validate().
+    """
+    if isinstance(data, list):
+        data = {"findings": data}
+    if not isinstance(data, dict):
+        return data
+    data = dict(data)
+
+    findings = []
+    for finding in data.get("findings") or []:
+        if not isinstance(finding, dict) or not _text(finding.get("issue")).strip():
+            continue
+        finding = dict(finding)
+        severity = _text(finding.get("severity")).strip().lower()
+        finding["severity"] = severity if severity in SEVERITIES else SEVERITY_ALIASES.get(severity, "info")
+        finding["issue"] = _text(finding["issue"])
+        for field in FINDING_TEXT_FIELDS:
+            finding[field] = _text(finding.get(field))
+        findings.append(finding)
+    data["findings"] = findings
+
+    score = data.get("score")
+    try:
+        score = round(float(str(score).split("/")[0].strip().rstrip("%")))
+    except (TypeError, ValueError):
+        score = 100 - sum(SCORE_PENALTIES[f["severity"]] for f in findings)
+    data["score"] = max(0, min(100, score))
+    data["summary"] = _text(data.get("summary"))
+    return data
+
+
+def normalize_synthesis(data):
+    """Coerce near-miss synthesis replies into SYNTHESIS_SCHEMA shape"""
+    if not isinstance(data, dict):
+        return data
+    data = dict(data)
+    health = _text(data.get("overall_health")).strip().lower().replace(" ", "_")
+    data["overall_health"] = health if health in HEALTH_LEVELS else "needs_attention"
+    actions = []
+    for item in data.get("immediate_actions") or []:
+        if isinstance(item, str):
+            item = {"action": item}
+        if isinstance(item, dict) and item.get("action"):
+            actions.append({key: _text(item.get(key)) for key in ("action", "why", "effort", "impact")})
+    data["immediate_actions"] = actions
+    for key in SYNTHESIS_SCHEMA["required"]:
+        if key != "immediate_actions" and key != "overall_health":
+            data[key] = _text(data.get(key)) or "N/A"
+    return data
+
+
+class StructuredOutput:
+    """A tool Claude is forced to call, whose input is the structured result.
+
+    conform(data) normalises a reply and validates it, returning
+    (data, errors); an empty error list means the data matches the schema.
+    """
+
+    def __init__(self, name, description, schema, normalize):
+        self.name = name
+        self.schema = schema
+        self.normalize = normalize
+        self.tool = {"name": name, "description": description, "input_schema": schema}
+
+    def conform(self, data):
+        data = self.normalize(data)
+        return data, validate(data, self.schema)
+
+
+AUDIT_OUTPUT = StructuredOutput(
+    "submit_audit",
+    "Submit the audit result for this section: the findings, a 0-100 score and a summary.",
+    AUDIT_SCHEMA, normalize_audit
+)
+
+SYNTHESIS_OUTPUT = StructuredOutput(
+    "submit_action_plan",
+    "Submit the strategic action plan synthesised from the section audits.",
+    SYNTHESIS_SCHEMA, normalize_synthesis
+)
@@ -1,16 +1,166 @@
 # Synthesizer - combines all audit results into a strategic action plan
-import json
-from config import client, MODEL, MAX_TOKENS
-from prompts import SYNTHESIS_PROMPT
-
-
-def synthesize_results(ga4_results, gtm_results, datalayer_results, setup):
-    """Generate a strategic synthesis of all audit findings"""
-    
-    def get_critical_high(findings):
-        items = [f for f in findings if f.get("severity") in ("critical", "high")]
-        return "; ".join([f.get("issue", "") for f in items]) or "None"
-    
+from cache import make_key
+from config import MODEL, SYNTHESIS_MODE
+from dedup import SECTION_LABELS, SEVERITY_RANK, visible_findings, also_reported_in
+from llm import complete_json
+from memo import synthesis_memo
+from prompts import SYNTHESIS_SYSTEM, SYNTHESIS_PROMPT
+from schemas import SYNTHESIS_OUTPUT, SCORE_PENALTIES
+from telemetry import timed, incr
+
+# Finding category -> (typical effort, impact weight 1-5, area name) for ranking local actions
+CATEGORY_PLAYBOOK = {
+    "pii": ("days", 5, "PII compliance"),
+    "consent": ("days", 4, "consent mode"),
+    "security": ("days", 4, "tag security"),
+    "ecommerce_gap": ("days", 4, "ecommerce tracking"),
+    "missing_event": ("days", 3, "event coverage"),
+    "duplicate": ("hours", 3, "duplicate tracking"),
+    "parameters": ("hours", 2, "event parameters"),
+    "data_types": ("hours", 2, "data types"),
+    "limits": ("hours", 2, "GA4 limits"),
+    "config": ("hours", 2, "configuration"),
+    "performance": ("days", 2, "page performance"),
+    "structure": ("weeks", 2, "dataLayer structure"),
+    "naming": ("hours", 1, "naming conventions"),
+    "dead_code": ("hours", 1, "container hygiene")
+}
+DEFAULT_PLAY = ("days", 2, "tracking quality")
+EFFORT_COST = {"hours": 1, "days": 2, "weeks": 4}
+SEVERITY_IMPACT = {
+    "critical": "Restores data that business decisions currently rely on incorrectly",
+    "high": "Closes a significant gap in what can be analysed",
+    "medium": "Brings the setup in line with best practice",
+    "low": "Minor clean-up",
+    "info": "Optional improvement"
+}
+CATEGORY_RISKS = {
+    "pii": "personal data keeps flowing into analytics, a breach of Google's terms and of GDPR that can get the property deleted",
+    "consent": "tracking without valid consent exposes the business to regulatory fines",
+    "security": "unvetted scripts in the container remain an attack surface",
+    "ecommerce_gap": "revenue, product and funnel reports stay incomplete",
+    "missing_event": "key conversions remain unmeasured, so marketing spend can't be attributed",
+    "duplicate": "inflated counts keep overstating conversions and distorting ROAS",
+    "data_types": "malformed values keep breaking revenue and audience reports"
+}
+DEFAULT_RISK = "decisions keep resting on incomplete or inaccurate data"
+# Average score (0-100) from which each health level applies, best first
+HEALTH_THRESHOLDS = [(90, "excellent"), (70, "good"), (55, "fair"), (40, "needs_attention"), (0, "critical")]
+MAX_LOCAL_ACTIONS = 5
+
+LOCAL_SUMMARY = ("The overall tracking score is {overall}/100 ({health}): GA4 {ga4}/100, GTM {gtm}/100 and "
+                 "dataLayer {datalayer}/100, with {critical} critical and {high} high severity issues. "
+                 "{focus}")
+LOCAL_30_DAY = ("Fix the {count} critical and high severity issues, starting with {first}. "
+                "Re-run the audit afterwards to confirm every fix is live.")
+LOCAL_30_DAY_CLEAN = "No critical or high severity issues: work through the {count} medium findings, starting with {first}."
+LOCAL_30_DAY_CLEAR = "No critical, high or medium issues: keep the tracking plan current and re-audit after each release."
+LOCAL_90_DAY = ("{goal} every section {at} 85+ (the weakest is {weakest} at {weakest_score}/100) by {cleanup}"
+                "documenting the tracking plan and monitoring key events so regressions are caught early.")
+LOCAL_CLEANUP = "clearing the remaining {count} medium and low findings in {areas}, "
+LOCAL_IMPROVEMENT = "About +{gain} points (from {overall} to {target}/100) once the immediate actions are done"
+
+
+def _first_sentence(text, limit=200):
+    text = (text or "").strip()
+    end = text.find(". ")
+    sentence = text[:end + 1] if 0 <= end < limit else text
+    return sentence if len(sentence) <= limit else sentence[:limit - 1].rstrip() + "…"
+
+
+def overall_health(scores, has_critical=False):
+    """Health level for the section scores; any critical finding caps it at needs_attention"""
+    average = sum(scores) / len(scores)
+    health = next(level for floor, level in HEALTH_THRESHOLDS if average >= floor)
+    if has_critical and health in ("excellent", "good", "fair"):
+        return "needs_attention"
+    return health
+
+
+@timed("synthesis_local", section="synthesis")
+def local_synthesis(ga4_results, gtm_results, datalayer_results, setup):
+    """Deterministic action plan built from the scores and findings alone, in milliseconds.
+
+    Immediate actions are the worst visible findings, ranked by severity,
+    then by impact per unit of effort from CATEGORY_PLAYBOOK (findings
+    several sections reported count more). The plans are templates filled
+    from the counts. Used as the instant first result and as the fallback
+    when the Claude synthesis fails.
+    """
+    results_by_section = {"ga4": ga4_results, "gtm": gtm_results, "datalayer": datalayer_results}
+    scores = {section: results.get("score", 0) for section, results in results_by_section.items()}
+    overall = round(sum(scores.values()) / len(scores))
+    findings = [f for results in results_by_section.values() for f in visible_findings(results)]
+    by_severity = {sev: [f for f in findings if f.get("severity") == sev] for sev in SEVERITY_RANK}
+    health = overall_health(list(scores.values()), has_critical=bool(by_severity["critical"]))
+
+    def play(finding):
+        return CATEGORY_PLAYBOOK.get(finding.get("category"), DEFAULT_PLAY)
+
+    def rank(finding):
+        effort, weight, _ = play(finding)
+        reach = 1 + len(finding.get("also_reported_in") or [])
+        return SEVERITY_RANK.get(finding.get("severity"), 5), -weight * reach / EFFORT_COST[effort]
+
+    urgent = sorted(by_severity["critical"] + by_severity["high"], key=rank)
+    pool = urgent or sorted(by_severity["medium"], key=rank)
+    actions = []
+    for finding in pool[:MAX_LOCAL_ACTIONS]:
+        effort, _, area = play(finding)
+        why = finding.get("issue", "")
+        if finding.get("also_reported_in"):
+            why += f" (also reported in {also_reported_in(finding)})"
+        actions.append({
+            "action": _first_sentence(finding.get("fix")) or finding.get("issue", ""),
+            "why": why,
+            "effort": effort,
+            "impact": f"{area.capitalize()}: {finding.get('business_impact') or SEVERITY_IMPACT.get(finding.get('severity'), '')}"
+        })
+
+    weakest = min(scores, key=scores.get)
+    areas = list(dict.fromkeys(play(f)[2] for f in pool))
+    focus = (f"The priority is {', '.join(areas[:3])}." if areas
+             else f"{SECTION_LABELS[weakest]} has the most room for improvement.")
+    first = f'"{pool[0].get("issue", "")}"' if pool else ""
+    remaining = by_severity["medium"] + by_severity["low"]
+    remaining_areas = list(dict.fromkeys(play(f)[2] for f in remaining))
+    gain = min(100 - overall, round(sum(SCORE_PENALTIES[f["severity"]] for f in urgent) / len(scores)))
+    risks = list(dict.fromkeys(CATEGORY_RISKS.get(f.get("category"), DEFAULT_RISK) for f in urgent[:MAX_LOCAL_ACTIONS]))
+
+    return {
+        "executive_summary": LOCAL_SUMMARY.format(
+            overall=overall, health=health.replace("_", " "), critical=len(by_severity["critical"]),
+            high=len(by_severity["high"]), focus=focus, **scores
+        ),
+        "overall_health": health,
+        "immediate_actions": actions,
+        "30_day_plan": (LOCAL_30_DAY.format(count=len(urgent), first=first) if urgent
+                        else LOCAL_30_DAY_CLEAN.format(count=len(pool), first=first) if pool
+                        else LOCAL_30_DAY_CLEAR),
+        "90_day_plan": LOCAL_90_DAY.format(goal="Keep" if scores[weakest] >= 85 else "Bring",
+                                           at="at" if scores[weakest] >= 85 else "to",
+                                           weakest=SECTION_LABELS[weakest], weakest_score=scores[weakest],
+                                           cleanup=LOCAL_CLEANUP.format(count=len(remaining),
+                                                                        areas=", ".join(remaining_areas[:4]))
+                                           if remaining else ""),
+        "estimated_data_quality_improvement": (LOCAL_IMPROVEMENT.format(gain=gain, overall=overall,
+                                                                        target=overall + gain)
+                                               if gain else "Little measurable change: there are no critical or high severity issues to fix"),
+        "risks_of_inaction": ("If left unaddressed, " + "; ".join(risks) + ".") if risks else "Low: no critical or high severity issues.",
+        "source": "local"
+    }
+
+
+@timed("synthesis", section="synthesis")
+def llm_synthesis(ga4_results, gtm_results, datalayer_results, setup, bypass_cache=False):
+    """Strategic synthesis written by Claude; None if no valid plan came back"""
+
+    def get_critical_high(results):
+        # Cross-section duplicates are listed once, noting where else they were found
+        items = [f for f in visible_findings(results) if f.get("severity") in ("critical", "high")]
+        return "; ".join(f.get("issue", "") + (f" (also in {also_reported_in(f)})" if f.get("also_reported_in") else "")
+                         for f in items) or "None"
+
     prompt = SYNTHESIS_PROMPT.format(
         industry=setup.get("industry", "N/A"),
         website_type=setup.get("website_type", "N/A"),
@@ -18,36 +168,37 @@ def synthesize_results(ga4_results, gtm_results, datalayer_results, setup):
         goals=", ".join(setup.get("goals", [])),
         ga4_score=ga4_results.get("score", 0),
         ga4_summary=ga4_results.get("summary", "N/A"),
-        ga4_critical=get_critical_high(ga4_results.get("findings", [])),
+        ga4_critical=get_critical_high(ga4_results),
         gtm_score=gtm_results.get("score", 0),
         gtm_summary=gtm_results.get("summary", "N/A"),
-        gtm_critical=get_critical_high(gtm_results.get("findings", [])),
+        gtm_critical=get_critical_high(gtm_results),
         datalayer_score=datalayer_results.get("score", 0),
         datalayer_summary=datalayer_results.get("summary", "N/A"),
-        datalayer_critical=get_critical_high(datalayer_results.get("findings", []))
+        datalayer_critical=get_critical_high(datalayer_results)
     )
-    
-    response = client.messages.create(
-        model=MODEL,
-        max_tokens=MAX_TOKENS,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    
-    response_text = response.content[0].text
-    cleaned = response_text.strip()
-    if cleaned.startswith("```"):
-        lines = cleaned.split("\n")
-        cleaned = "\n".join(lines[1:-1])
-    
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        return {
-            "executive_summary": "Could not generate synthesis. Please review individual audit sections.",
-            "overall_health": "needs_attention",
-            "immediate_actions": [],
-            "30_day_plan": "Review individual audit findings.",
-            "90_day_plan": "Implement all recommended fixes.",
-            "estimated_data_quality_improvement": "N/A",
-            "risks_of_inaction": "N/A"
-        }
\ No newline at end of file
+
+    def generate():
+        data, _ = complete_json(prompt, system=SYNTHESIS_SYSTEM, output=SYNTHESIS_OUTPUT,
+                                bypass_cache=bypass_cache)
+        return data
+
+    # Shared across sessions; concurrent identical syntheses make one request
+    data, _ = synthesis_memo.get_or_compute(make_key("synthesis", MODEL, prompt), generate,
+                                            keep=lambda data: data is not None, refresh=bypass_cache)
+    return dict(data, source="llm") if data is not None else None
+
+
+def synthesize_results(ga4_results, gtm_results, datalayer_results, setup, bypass_cache=False,
+                       mode=SYNTHESIS_MODE):
+    """Generate a strategic synthesis of all audit findings.
+
+    mode "llm" asks Claude and falls back to local_synthesis if no valid plan
+    comes back; mode "local" returns local_synthesis straight away. The
+    result's "source" says which one produced it.
+    """
+    if mode != "local":
+        data = llm_synthesis(ga4_results, gtm_results, datalayer_results, setup, bypass_cache=bypass_cache)
+        if data is not None:
+            return data
+        incr("synthesis_fallbacks")
+    return local_synthesis(ga4_results, gtm_results, datalayer_results, setup)
@@ -0,0 +1,164 @@
+# Telemetry - spans and counters showing where a run spends its time and tokens
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRIC_PREFIX = "audit"
+
+# Labels set by an enclosing span (e.g. section="ga4") are inherited by nested
+# spans and counters, including work submitted with ratelimit.submit_with_context
+_labels = contextvars.ContextVar("telemetry_labels", default={})
+_run = contextvars.ContextVar("telemetry_run", default=None)
+
+
+class Metrics:
+    """Aggregated spans (count / total / max seconds) and counters, keyed by name and labels"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.spans = {}
+        self.counters = {}
+
+    def observe(self, key, seconds):
+        with self.lock:
+            stats = self.spans.setdefault(key, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def add(self, key, value):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def summary(self):
+        """JSON-ready view: wall time, per-stage timings and counters"""
+        with self.lock:
+            spans = dict(self.spans)
+            counters = dict(self.counters)
+        return {
+            "wall_seconds": round(time.time() - self.started, 3),
+            "stages": {
+                _key_name(key): {"count": count, "total_seconds": round(total, 3), "max_seconds": round(peak, 3)}
+                for key, (count, total, peak) in sorted(spans.items())
+            },
+            "counters": {_key_name(key): round(value, 3) for key, value in sorted(counters.items())}
+        }
+
+    def to_prometheus(self):
+        """Prometheus text exposition format: stage timings as summaries, counters as counters"""
+        with self.lock:
+            spans = dict(self.spans)
+            counters = dict(self.counters)
+
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds Time spent in each stage of an audit run",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds summary"
+        ]
+        for (name, labels), (count, total, _) in sorted(spans.items()):
+            label_text = _prom_labels((("stage", name),) + labels)
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_count{label_text} {count}")
+            lines.append(f"{METRIC_PREFIX}_stage_seconds_sum{label_text} {total:.6f}")
+
+        by_name = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for name, series in sorted(by_name.items()):
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for labels, value in sorted(series):
+                lines.append(f"{metric}{_prom_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.spans.clear()
+            self.counters.clear()
+
+
+def _key_name(key):
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+
+def _prom_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+# Process-wide totals (what a scraper sees); per-run metrics are collected alongside
+registry = Metrics()
+
+
+def _record(method, name, value, labels):
+    merged = {**_labels.get(), **labels}
+    key = (name, tuple(sorted((k, str(v)) for k, v in merged.items())))
+    getattr(registry, method)(key, value)
+    run = _run.get()
+    if run is not None:
+        getattr(run, method)(key, value)
+
+
+@contextmanager
+def span(name, **labels):
+    """Time the block as stage `name`; labels are inherited by nested spans and counters"""
+    token = _labels.set({**_labels.get(), **labels})
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        incr("errors", stage=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        _labels.reset(token)
+        _record("observe", name, elapsed, labels)
+
+
+def timed(name, **labels):
+    """Decorator form of span()"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def incr(name, value=1, **labels):
+    """Add value to counter `name` (exported as audit_<name>_total)"""
+    _record("add", name, value, labels)
+
+
+@contextmanager
+def collect():
+    """Collect the spans and counters of everything run inside the block into a fresh Metrics"""
+    run = Metrics()
+    token = _run.set(run)
+    try:
+        yield run
+    finally:
+        _run.reset(token)
+
+
+def write_prometheus(path, metrics=None):
+    """Write a Prometheus textfile (e.g. for node_exporter's textfile collector) atomically"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write((metrics or registry).to_prometheus())
+    os.replace(tmp_path, path)
+
+
+def format_summary(metrics):
+    """The run summary as indented JSON, as the CLI prints it"""
+    return json.dumps(metrics.summary(), indent=2)